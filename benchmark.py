@@ -0,0 +1,243 @@
+# offline benchmark for driver-comparison.py
+#
+# record the API responses of a normal run (they're all in the response cache) as fixtures:
+#   python driver-comparison.py --season 2025
+#   python benchmark.py record --cache-dir .cache --fixtures benchmark-fixtures/2025
+#
+# replay them from a local stand-in server with injected latency and time a full build:
+#   python benchmark.py run --fixtures benchmark-fixtures/2025 --latency typical --save bench-2025.json
+#   python benchmark.py run --fixtures benchmark-fixtures/2025 --latency typical --baseline bench-2025.json
+#
+# fastf1 sessions can't be served this way, they're replayed from the recorded fastf1 cache in offline mode
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'driver-comparison.py')
+
+# mean and standard deviation of the delay added to every response, in milliseconds
+LATENCY_PROFILES = {
+    'none': (0, 0),
+    'lan': (5, 2),
+    'typical': (120, 60),
+    'slow': (400, 200)
+}
+
+def getFixtureKey(path, query):
+    return path + '?' + '&'.join(f"{key}={value}" for key, value in sorted(query))
+
+def recordFixtures(cacheDir, fixturesDir):
+    responses = {}
+    for name in os.listdir(cacheDir):
+        if not name.endswith('.json'):
+            continue
+
+        with open(os.path.join(cacheDir, name)) as f:
+            entry = json.load(f)
+
+        parts = urlsplit(entry['url'])
+        query = parse_qsl(parts.query) + [(key, str(value)) for key, value in (entry['params'] or {}).items()]
+        responses[getFixtureKey(parts.path, query)] = entry['data']
+
+    os.makedirs(fixturesDir, exist_ok=True)
+    with open(os.path.join(fixturesDir, 'responses.json'), 'w') as f:
+        json.dump(responses, f)
+
+    fastf1CacheDir = os.path.join(cacheDir, 'fastf1')
+    if os.path.isdir(fastf1CacheDir):
+        shutil.copytree(fastf1CacheDir, os.path.join(fixturesDir, 'fastf1'), dirs_exist_ok=True)
+
+    print(f"Recorded {len(responses)} responses to {fixturesDir}")
+
+def loadFixtures(fixturesDir):
+    with open(os.path.join(fixturesDir, 'responses.json')) as f:
+        responses = json.load(f)
+    return {key: json.dumps(data).encode() for key, data in responses.items()}
+
+def startServer(responses, latency):
+    stats = {'requests': 0, 'bytes': 0, 'missing': set()}
+    statsLock = threading.Lock()
+    meanDelay, delayJitter = latency
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            key = getFixtureKey(parts.path, parse_qsl(parts.query))
+            body = responses.get(key)
+
+            time.sleep(max(0.0, random.gauss(meanDelay, delayJitter)) / 1000)
+
+            if body is None:
+                self.send_response(404)
+                body = b'{}'
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+            with statsLock:
+                stats['requests'] += 1
+                stats['bytes'] += len(body)
+                if key not in responses:
+                    stats['missing'].add(key)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+def getPeakRssMb():
+    if resource is None:
+        return None
+
+    peakRss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        return round(peakRss / 1024 / 1024, 1)
+    return round(peakRss / 1024, 1)
+
+def runPipeline(fixturesDir, season, baseUrl):
+    workDir = tempfile.mkdtemp(prefix='f1-benchmark-')
+    try:
+        cacheDir = os.path.join(workDir, 'cache')
+        fixturesFastf1Dir = os.path.join(fixturesDir, 'fastf1')
+        if os.path.isdir(fixturesFastf1Dir):
+            shutil.copytree(fixturesFastf1Dir, os.path.join(cacheDir, 'fastf1'))
+
+        reportPath = os.path.join(workDir, 'run-report.json')
+        env = dict(os.environ, F1_JOLPICA_URL=f"{baseUrl}/ergast/f1", F1_WIKIPEDIA_API_URL=f"{baseUrl}/w/api.php")
+        command = [sys.executable, SCRIPT, '--season', str(season), '--cache-dir', cacheDir, '--fastf1-offline', '--report', reportPath]
+
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=workDir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        wallTime = time.perf_counter() - start
+
+        if result.returncode != 0:
+            print(result.stderr)
+            raise RuntimeError(f"driver-comparison.py exited with {result.returncode}")
+
+        with open(reportPath) as f:
+            runReport = json.load(f)
+        return wallTime, runReport
+
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+def runBenchmark(fixturesDir, season, latencyName, repeat):
+    responses = loadFixtures(fixturesDir)
+    server, stats = startServer(responses, LATENCY_PROFILES[latencyName])
+    baseUrl = f"http://127.0.0.1:{server.server_address[1]}"
+
+    runs = []
+    try:
+        for _ in range(repeat):
+            stats['requests'] = 0
+            stats['bytes'] = 0
+            wallTime, runReport = runPipeline(fixturesDir, season, baseUrl)
+            runs.append({'wallTime': round(wallTime, 3), 'requests': stats['requests'], 'bytes': stats['bytes'], 'stages': runReport['stages'], 'endpoints': runReport['endpoints']})
+    finally:
+        server.shutdown()
+
+    # the median run is reported, the others are kept for reference
+    medianRun = sorted(runs, key=lambda run: run['wallTime'])[len(runs) // 2]
+    return {
+        'season': season,
+        'latency': latencyName,
+        'wallTime': medianRun['wallTime'],
+        'wallTimes': [run['wallTime'] for run in runs],
+        'requests': medianRun['requests'],
+        'bytes': medianRun['bytes'],
+        'peakRssMb': getPeakRssMb(),
+        'stages': medianRun['stages'],
+        'endpoints': medianRun['endpoints'],
+        'missingFixtures': sorted(stats['missing'])
+    }
+
+def printReport(report):
+    print(f"season {report['season']}, latency profile '{report['latency']}'")
+    print(f"  wall time:   {report['wallTime']:.2f}s (runs: {', '.join(f'{t:.2f}' for t in report['wallTimes'])})")
+    print(f"  requests:    {report['requests']}")
+    print(f"  transferred: {report['bytes'] / 1024:.1f} KiB")
+    if report['peakRssMb'] is not None:
+        print(f"  peak RSS:    {report['peakRssMb']:.1f} MiB")
+    for name, seconds in report['stages'].items():
+        print(f"  {name + ':':<20} {seconds:.3f}s")
+    for endpoint, endpointStats in report.get('endpoints', {}).items():
+        print(f"  {endpoint + ':':<40} {endpointStats['requests']} requests, {endpointStats['seconds']:.2f}s waiting on responses")
+    if report['missingFixtures']:
+        print(f"  {len(report['missingFixtures'])} requests had no recorded response, e.g. {report['missingFixtures'][0]}")
+
+def findRegressions(report, baseline, threshold):
+    regressions = []
+
+    if report['wallTime'] > baseline['wallTime'] * (1 + threshold):
+        regressions.append(f"wall time {report['wallTime']:.2f}s vs {baseline['wallTime']:.2f}s baseline")
+    if report['requests'] > baseline['requests']:
+        regressions.append(f"{report['requests']} requests vs {baseline['requests']} baseline")
+    if report['bytes'] > baseline['bytes'] * (1 + threshold):
+        regressions.append(f"{report['bytes']} bytes vs {baseline['bytes']} baseline")
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark for driver-comparison.py')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    recordParser = subparsers.add_parser('record', help='turn a filled response cache into benchmark fixtures')
+    recordParser.add_argument('--cache-dir', default='.cache')
+    recordParser.add_argument('--fixtures', required=True)
+
+    runParser = subparsers.add_parser('run', help='time a full build against the recorded fixtures')
+    runParser.add_argument('--fixtures', required=True)
+    runParser.add_argument('--season', type=int, default=2025)
+    runParser.add_argument('--latency', choices=sorted(LATENCY_PROFILES), default='typical')
+    runParser.add_argument('--repeat', type=int, default=1, help='run the build this many times and report the median')
+    runParser.add_argument('--save', help='write the report to this JSON file')
+    runParser.add_argument('--baseline', help='report from an earlier run to compare against')
+    runParser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown against the baseline, 0.1 is 10%%')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        recordFixtures(args.cache_dir, args.fixtures)
+        return
+
+    report = runBenchmark(args.fixtures, args.season, args.latency, args.repeat)
+    printReport(report)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = findRegressions(report, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+# driver statistics for the data-f1 dashboard
+#
+# nothing is imported here, so `import dataf1` stays cheap and every submodule can be used on its own, e.g.
+# to score a season in-process:
+#   from dataf1.season import newSeasonState
+#   from dataf1.scoring import getSeasonTable, scoreSeasonTable
+#
+# `python -m dataf1 --help` lists the commands, see cli.py
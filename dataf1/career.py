@@ -0,0 +1,176 @@
+import importlib.util
+import logging
+import re
+import urllib.parse
+
+import pandas as pd
+
+from .fetch import fetchJson, WIKIPEDIA_API_URL, WIKIPEDIA_HEADERS
+
+log = logging.getLogger(__name__)
+
+# the MediaWiki API returns page content for at most 50 titles per request
+WIKIPEDIA_BATCH_SIZE = 50
+
+# '| wins = 32<ref>...</ref>' lines of an infobox template, refs and comments are stripped before reading the number
+INFOBOX_FIELD = re.compile(r'^\s*\|\s*([^=|\n]+?)\s*=([^\n]*)', re.MULTILINE)
+WIKITEXT_NOISE = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>|<!--.*?-->', re.DOTALL)
+
+def getEmptyCareerStats():
+    return {'Championships': 0, 'Wins': 0, 'Podiums': 0, 'Points': 0, 'Entries': 0}
+
+def readCareerStat(stats, foundStats, header, valueText):
+    numbers = re.findall(r'(\d+(?:,\d+)*(?:\.\d+)?)', valueText)
+    if not numbers:
+        return
+    
+    cleanValue = numbers[0].replace(',', '')
+    
+    if 'championships' in header and not foundStats['Championships']:
+        stats['Championships'] = int(float(cleanValue))
+        foundStats['Championships'] = True
+    elif 'wins' in header and not foundStats['Wins']:
+        stats['Wins'] = int(float(cleanValue))
+        foundStats['Wins'] = True
+    elif 'podiums' in header and not foundStats['Podiums']:
+        stats['Podiums'] = int(float(cleanValue))
+        foundStats['Podiums'] = True
+    elif 'points' in header and not foundStats['Points']:
+        stats['Points'] = float(cleanValue)
+        foundStats['Points'] = True
+    elif 'entries' in header and not foundStats['Entries']:
+        stats['Entries'] = int(float(cleanValue))
+        foundStats['Entries'] = True
+
+def parseInfoboxWikitext(wikitext):
+    stats = getEmptyCareerStats()
+    foundStats = {'Championships': False, 'Wins': False, 'Podiums': False, 'Points': False, 'Entries': False}
+    
+    for name, valueText in INFOBOX_FIELD.findall(WIKITEXT_NOISE.sub('', wikitext)):
+        header = name.lower()
+        # the racing driver series section takes entries as 'races', it's rendered as 'Entries'
+        if header == 'races':
+            header = 'entries'
+        readCareerStat(stats, foundStats, header, valueText)
+    
+    if not any(foundStats.values()):
+        return None
+    return stats
+
+def getHtmlParser():
+    # lxml is only checked for, BeautifulSoup imports it itself
+    if importlib.util.find_spec('lxml') is not None:
+        return 'lxml'
+    return 'html.parser'
+
+def getRenderedCareerStats(pageTitle):
+    from bs4 import BeautifulSoup
+    
+    # only the lead section is rendered, that's where the infobox is
+    params = {
+        'action': 'parse',
+        'format': 'json',
+        'page': pageTitle,
+        'prop': 'text',
+        'section': 0,
+        'redirects': True
+    }
+    
+    try:
+        data = fetchJson(WIKIPEDIA_API_URL, params=params, headers=WIKIPEDIA_HEADERS)
+        
+        htmlContent = data.get('parse', {}).get('text', {}).get('*', '')
+        if not htmlContent:
+            log.warning(f"htmlContent not found for {pageTitle}")
+            return getEmptyCareerStats()
+        
+        stats = getEmptyCareerStats()
+        
+        soup = BeautifulSoup(htmlContent, getHtmlParser())
+        
+        infobox = soup.find('table', class_='infobox')
+        if not infobox:
+            return stats
+        
+        foundStats = {'Championships': False, 'Wins': False, 'Podiums': False, 'Points': False, 'Entries': False}
+        
+        for row in infobox.find_all('tr'):
+            th = row.find('th')
+            td = row.find('td')
+            
+            if th and td:
+                readCareerStat(stats, foundStats, th.get_text(strip=True).lower(), td.get_text(strip=True))
+        return stats
+    
+    # a request that failed is raised rather than read as a driver without career stats
+    except KeyError as e:
+        log.warning(f"Error parsing Wikipedia response: {e}")
+        return getEmptyCareerStats()
+
+def fetchWikitexts(titles):
+    params = {
+        'action': 'query',
+        'format': 'json',
+        'formatversion': 2,
+        'prop': 'revisions',
+        'rvprop': 'content',
+        'rvslots': 'main',
+        'rvsection': 0,
+        'titles': '|'.join(titles),
+        'redirects': True
+    }
+    
+    aliases = {}
+    contents = {}
+    continueParams = {}
+    
+    while True:
+        data = fetchJson(WIKIPEDIA_API_URL, params={**params, **continueParams}, headers=WIKIPEDIA_HEADERS)
+        query = data.get('query', {})
+        
+        for alias in query.get('normalized', []) + query.get('redirects', []):
+            aliases[alias['from']] = alias['to']
+        
+        for page in query.get('pages', []):
+            if page.get('revisions'):
+                contents[page['title']] = page['revisions'][0]['slots']['main']['content']
+        
+        if 'continue' not in data:
+            break
+        continueParams = data['continue']
+    
+    wikitexts = {}
+    for title in titles:
+        # a title can be normalized ('_' to ' ') and then redirected
+        resolvedTitle = title
+        for _ in range(3):
+            resolvedTitle = aliases.get(resolvedTitle, resolvedTitle)
+        wikitexts[title] = contents.get(resolvedTitle, '')
+    
+    return wikitexts
+
+def getAllCareerStats(urls):
+    pageTitles = {url: urllib.parse.unquote(url.split('/wiki/')[-1]) for url in urls}
+    uniqueTitles = sorted(set(pageTitles.values()))
+    
+    # a batch that can't be fetched fails the stage, rather than writing zeroed career stats or
+    # falling back to rendering every one of its pages
+    wikitexts = {}
+    for start in range(0, len(uniqueTitles), WIKIPEDIA_BATCH_SIZE):
+        try:
+            wikitexts.update(fetchWikitexts(uniqueTitles[start:start + WIKIPEDIA_BATCH_SIZE]))
+        except KeyError as e:
+            raise RuntimeError(f"Error parsing Wikipedia response: {e}") from e
+    
+    careerStats = {}
+    for url, pageTitle in pageTitles.items():
+        stats = parseInfoboxWikitext(wikitexts.get(pageTitle, ''))
+        if stats is None:
+            # the infobox can come from a template that isn't in the page's own wikitext
+            stats = getRenderedCareerStats(pageTitle)
+        careerStats[url] = stats
+    
+    return careerStats
+
+def getCareerStats(url):
+    return pd.DataFrame([getAllCareerStats([url])[url]])
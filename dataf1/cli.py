@@ -0,0 +1,212 @@
+import argparse
+import csv
+import logging
+import sys
+import time
+from datetime import datetime
+
+from .instrumentation import RUN_REPORT, setupLogging, getSeasonReport, writeRunReport
+
+log = logging.getLogger(__name__)
+
+# pandas, fastf1 and bs4 are only imported by the command that needs them, so --help and
+# the quick commands don't pay for fastf1's import time
+
+COMMANDS = ['build', 'refresh', 'watch', 'serve', 'standings', 'career-stats', 'rescore']
+
+def parseSeasons(text):
+    # '2015-2024' or '2018,2021,2025'
+    seasons = []
+    for part in text.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            seasons.extend(range(int(first), int(last) + 1))
+        else:
+            seasons.append(int(part))
+    return seasons
+
+def configure(args):
+    from . import fetch, sessions
+    
+    setupLogging(args.verbose)
+    fetch.OFFLINE = args.offline
+    fetch.CACHE_DIR = args.cache_dir
+    sessions.FASTF1_OFFLINE = args.fastf1_offline
+
+def getSeason(args):
+    from .season import DEFAULT_SEASON
+    return args.season or DEFAULT_SEASON
+
+def runBuild(args):
+    from .fetch import evictCache
+    from .pipeline import buildSeasonOrError, runBackfill
+    
+    startedAt = datetime.now().isoformat(timespec='seconds')
+    start = time.perf_counter()
+    seasons = args.backfill or [getSeason(args)]
+    if args.backfill:
+        outputs = runBackfill(seasons, args.workers, args.incremental, args.verbose)
+    else:
+        outputs = [buildSeasonOrError(seasons[0], args.incremental)]
+    
+    seasonReports = {}
+    for year, (output, metrics) in zip(seasons, outputs):
+        if isinstance(output, Exception):
+            log.error(f"Season {year} failed: {output}")
+        else:
+            log.info(f"Season {year} written to {output}")
+        seasonReports[year] = getSeasonReport(output, metrics)
+    
+    evictCache()
+    writeRunReport(args.report, startedAt, time.perf_counter() - start, seasonReports)
+    
+    if any(seasonReport['error'] for seasonReport in seasonReports.values()):
+        return 1
+    return 0
+
+def runWatch(args):
+    from .watch import watchSeason
+    
+    try:
+        watchSeason(getSeason(args), args.report)
+    except KeyboardInterrupt:
+        log.info("Stopped watching")
+    return 0
+
+def runServe(args):
+    from .server import serveSeason
+    
+    try:
+        serveSeason(getSeason(args), args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def runStandings(args):
+    import requests
+    from .season import newSeasonState, loadSeasonState, getRoundCount, updateResultsTable, getResultsTable
+    from .standings import computeStandings
+    
+    # the saved state spares refetching finished rounds, but isn't written back so the next refresh still picks up new ones
+    year = getSeason(args)
+    seasonState = loadSeasonState(year) or newSeasonState(year)
+    try:
+        updateResultsTable(range(1, getRoundCount(year) + 1), seasonState)
+    # updateResultsTable raises a RuntimeError naming the rounds that failed
+    except (requests.RequestException, RuntimeError) as e:
+        log.error(f"Couldn't fetch the {year} results: {e}")
+        return 1
+    
+    key = 'constructorId' if args.constructors else 'driverId'
+    standings = computeStandings(getResultsTable(seasonState), key)
+    if standings.empty:
+        log.warning(f"No results for {year} yet")
+        return 1
+    
+    roundNum = args.round or standings['round'].max()
+    standings = standings[standings['round'] == roundNum].sort_values('position')
+    standings.to_csv(sys.stdout, index=False)
+    return 0
+
+def runCareerStats(args):
+    import pandas as pd
+    import requests
+    from .career import getAllCareerStats
+    from .drivers import getDrivers
+    
+    seasonDrivers = getDrivers(getSeason(args))
+    if seasonDrivers.empty:
+        return 1
+    if args.driver:
+        seasonDrivers = seasonDrivers[seasonDrivers['driverId'].isin(args.driver)]
+    
+    try:
+        careerStats = getAllCareerStats(seasonDrivers['url'].tolist())
+    except (requests.RequestException, RuntimeError) as e:
+        log.error(f"Couldn't fetch the career stats: {e}")
+        return 1
+    statsTable = pd.DataFrame([careerStats[url] for url in seasonDrivers['url']])
+    statsTable.insert(0, 'driverId', seasonDrivers['driverId'].tolist())
+    statsTable.to_csv(sys.stdout, index=False)
+    return 0
+
+def runRescore(args):
+    from .store import STORE_PATH, connect, rescoreSeason
+    
+    # only reads the local store, so it never makes a request
+    try:
+        connection = connect(readOnly=True)
+    except (FileNotFoundError, RuntimeError) as e:
+        log.error(str(e))
+        return 1
+    try:
+        writer = csv.writer(sys.stdout, lineterminator='\n')
+        writer.writerow(['season', 'driverId', 'QualifyingPerformance', 'RacePace'])
+        status = 0
+        for year in args.seasons or [getSeason(args)]:
+            start = time.perf_counter()
+            scores = rescoreSeason(connection, year, args.quali_compression, args.race_compression)
+            if not scores:
+                log.warning(f"No results for {year} in {STORE_PATH}, build it first")
+                status = 1
+            log.info(f"Rescored {year} in {time.perf_counter() - start:.3f}s")
+            writer.writerows((year,) + row for row in scores)
+    finally:
+        connection.close()
+    return status
+
+def getParser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--season', type=int, help='season, defaults to the current one')
+    common.add_argument('--offline', action='store_true', help='rebuild purely from the local cache, with no network access')
+    common.add_argument('--cache-dir', default='.cache', help='directory for cached API responses')
+    common.add_argument('--fastf1-offline', action='store_true', help='only load fastf1 sessions from the cache, other requests still go out')
+    common.add_argument('-v', '--verbose', action='count', default=0, help='-v for progress, -vv for debug output')
+    
+    parser = argparse.ArgumentParser(prog='dataf1', description='Driver statistics for the data-f1 dashboard')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    for command, incremental, helpText in [('build', False, 'full build of drivers-<season>.csv'), ('refresh', True, 'only fetch rounds not yet in the previous build and merge them in')]:
+        buildParser = subparsers.add_parser(command, parents=[common], help=helpText)
+        if not incremental:
+            buildParser.add_argument('--incremental', action='store_true', help='same as the refresh command')
+        buildParser.add_argument('--backfill', type=parseSeasons, help="build several seasons in parallel, e.g. '2015-2024'")
+        buildParser.add_argument('--workers', type=int, default=4, help='worker processes for --backfill')
+        buildParser.add_argument('--report', default=RUN_REPORT, help='write stage timings and per-endpoint request counts to this JSON file')
+        buildParser.set_defaults(run=runBuild, incremental=incremental)
+    
+    watchParser = subparsers.add_parser('watch', parents=[common], help='keep running and rebuild as soon as a new round has results')
+    watchParser.add_argument('--report', default=RUN_REPORT, help='write the run report of every rebuild to this JSON file')
+    watchParser.set_defaults(run=runWatch)
+    
+    serveParser = subparsers.add_parser('serve', parents=[common], help="serve a built season's drivers, standings and results as a local JSON API")
+    serveParser.add_argument('--host', default='127.0.0.1')
+    serveParser.add_argument('--port', type=int, default=8001)
+    serveParser.set_defaults(run=runServe)
+    
+    standingsParser = subparsers.add_parser('standings', parents=[common], help='print the championship standings as CSV')
+    standingsParser.add_argument('--round', type=int, help='standings after this round, defaults to the latest')
+    standingsParser.add_argument('--constructors', action='store_true', help="constructors' instead of drivers' standings")
+    standingsParser.set_defaults(run=runStandings)
+    
+    careerParser = subparsers.add_parser('career-stats', parents=[common], help="print the season's drivers' career stats as CSV")
+    careerParser.add_argument('--driver', action='append', help='only this driverId, can be given more than once')
+    careerParser.set_defaults(run=runCareerStats)
+    
+    rescoreParser = subparsers.add_parser('rescore', parents=[common], help='print qualifying and race pace scores recomputed from the local store as CSV')
+    rescoreParser.add_argument('--seasons', type=parseSeasons, help="seasons to rescore, e.g. '2015-2024', defaults to --season")
+    rescoreParser.add_argument('--quali-compression', type=float, help="how far expected qualifying positions are pulled towards the middle of the field, defaults to the build's")
+    rescoreParser.add_argument('--race-compression', type=float, help='the same for race positions')
+    rescoreParser.set_defaults(run=runRescore)
+    
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # 'driver-comparison.py --season 2025' from before the subcommands still runs a full build
+    if not argv or argv[0] not in COMMANDS + ['-h', '--help']:
+        argv = ['build'] + argv
+    
+    args = getParser().parse_args(argv)
+    configure(args)
+    return args.run(args)
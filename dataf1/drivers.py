@@ -0,0 +1,47 @@
+import logging
+
+import pandas as pd
+import requests
+
+from .fetch import fetchJson, JOLPICA_URL
+
+log = logging.getLogger(__name__)
+
+def getDrivers(year):
+    url = f"{JOLPICA_URL}/{year}/drivers/?format=json"
+    #print(url)
+    try:
+        data = fetchJson(url)
+        driversData = data['MRData']['DriverTable']['Drivers']
+        #print(driversData)
+        driversList = []
+        for driver in driversData:
+            driverInfo = {
+                'driverId': driver['driverId'],
+                'driverNumber': driver.get('permanentNumber', 'N/A'),
+                'code': driver.get('code', 'N/A'),
+                'firstName': driver['givenName'],
+                'lastName': driver['familyName'],
+                'dateOfBirth': driver['dateOfBirth'],
+                'nationality': driver['nationality'],
+                'url': driver['url']
+            }
+            driversList.append(driverInfo)
+        
+        df = pd.DataFrame(driversList)
+        
+        df['driverId'] = df['driverId'].astype(str)
+        df['firstName'] = df['firstName'].astype(str)
+        df['lastName'] = df['lastName'].astype(str)
+        df['nationality'] = df['nationality'].astype(str)
+        df['url'] = df['url'].astype(str)
+        df['code'] = df['code'].astype(str)
+        
+        return df
+    
+    except requests.exceptions.RequestException as e:
+        log.warning(f"Error fetching drivers: {e}")
+        return pd.DataFrame()
+    except KeyError as e:
+        log.warning(f"Error parsing response: {e}")
+        return pd.DataFrame()
@@ -0,0 +1,327 @@
+import email.utils
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .instrumentation import recordRequest
+
+# per-round Jolpica requests are sent concurrently, but never more than MAX_CONCURRENT_REQUESTS at once
+MAX_CONCURRENT_REQUESTS = 4
+
+# requests per second to each host: every host starts at 'rate', gains RATE_INCREASE after each healthy
+# response up to 'max' and has its rate multiplied by RATE_DECREASE on a 429/5xx, down to 'min'
+# up to 'burst' requests can go out back to back, Jolpica allows bursts of 4 a second
+HOST_LIMITS = {
+    'jolpica': {'rate': 4, 'min': 0.25, 'max': 4, 'burst': 4},
+    'wikipedia': {'rate': 4, 'min': 0.25, 'max': 10, 'burst': 4},
+    'other': {'rate': 4, 'min': 0.25, 'max': 4, 'burst': 4}
+}
+RATE_INCREASE = 0.25
+RATE_DECREASE = 0.5
+
+# a 429, a 5xx or a dropped connection is retried up to MAX_RETRIES times, after a random
+# wait of up to RETRY_BACKOFF * 2^attempt seconds or whatever Retry-After asks for
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 4
+RETRY_BACKOFF = 1.0
+MAX_RETRY_AFTER = 120
+REQUEST_TIMEOUT = 30
+
+# every API response is kept on disk under CACHE_DIR, keyed by url and params
+CACHE_DIR = '.cache'
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+OFFLINE = False
+
+# seconds a cached response stays fresh, the first matching pattern wins and None never expires
+# a round only has data once it has been completed, so per-round responses with data never expire
+CACHE_TTLS = [
+    (r'/last/', 10 * 60),
+    (r'/ergast/f1/\d+/sprint/', 10 * 60),
+    (r'/ergast/f1/\d+/\d+/', None),
+    (r'/drivers/', 24 * 60 * 60),
+    (r'wikipedia\.org', 7 * 24 * 60 * 60),
+]
+DEFAULT_CACHE_TTL = 60 * 60
+EMPTY_RESPONSE_TTL = 10 * 60
+
+# both can be pointed at a local stand-in server, see benchmark.py
+JOLPICA_URL = os.environ.get('F1_JOLPICA_URL', 'https://api.jolpi.ca/ergast/f1')
+WIKIPEDIA_API_URL = os.environ.get('F1_WIKIPEDIA_API_URL', 'https://en.wikipedia.org/w/api.php')
+WIKIPEDIA_HEADERS = {
+    'User-Agent': 'F1DriverStats/1.0 (nb622@kent.ac.uk)'
+}
+
+# [tokens, updatedAt, rate] for every host in HOST_LIMITS, in shared memory so backfill worker
+# processes draw from the same request budget (see initBackfillWorker); only allocated once the
+# first request goes out, see getGovernorState
+HOST_INDEX = {host: index * 3 for index, host in enumerate(HOST_LIMITS)}
+governorState = None
+governorStateLock = threading.Lock()
+
+# one pooled keep-alive session per process, a forked worker opens its own connections
+httpSession = None
+httpSessionPid = None
+httpSessionLock = threading.Lock()
+
+def getEndpointName(url, params=None):
+    # '.../2025/3/results/?format=json' is counted as 'jolpica /{season}/{round}/results'
+    if url.startswith(WIKIPEDIA_API_URL):
+        return f"wikipedia {(params or {}).get('action', 'query')}"
+    if not url.startswith(JOLPICA_URL):
+        return urllib.parse.urlsplit(url).netloc
+    
+    placeholders = ['{season}', '{round}']
+    segments = []
+    for segment in urllib.parse.urlsplit(url[len(JOLPICA_URL):]).path.split('/'):
+        if segment.isdigit() and placeholders:
+            segment = placeholders.pop(0)
+        if segment:
+            segments.append(segment)
+    return 'jolpica /' + '/'.join(segments)
+
+def getGovernorState():
+    global governorState
+    with governorStateLock:
+        if governorState is None:
+            governorState = multiprocessing.Array('d', [value for limits in HOST_LIMITS.values() for value in (limits['burst'], time.monotonic(), limits['rate'])])
+        return governorState
+
+def getHost(url):
+    if url.startswith(JOLPICA_URL):
+        return 'jolpica'
+    if url.startswith(WIKIPEDIA_API_URL):
+        return 'wikipedia'
+    return 'other'
+
+def waitForRateLimit(host):
+    # takes a token from the host's bucket, going into debt if it's empty and waiting until the debt is paid off;
+    # after a Retry-After the bucket only starts refilling once the block is over (see updateRateLimit)
+    limits = HOST_LIMITS[host]
+    index = HOST_INDEX[host]
+    governorState = getGovernorState()
+    with governorState.get_lock():
+        tokens, updatedAt, rate = governorState[index:index + 3]
+        now = time.monotonic()
+        if now > updatedAt:
+            tokens = min(limits['burst'], tokens + (now - updatedAt) * rate)
+            updatedAt = now
+        tokens -= 1
+        governorState[index] = tokens
+        governorState[index + 1] = updatedAt
+        waitTime = max(0.0, updatedAt - now - tokens / rate)
+    if waitTime > 0:
+        time.sleep(waitTime)
+    return waitTime
+
+def updateRateLimit(host, healthy, retryAfter=None):
+    limits = HOST_LIMITS[host]
+    index = HOST_INDEX[host]
+    governorState = getGovernorState()
+    with governorState.get_lock():
+        if healthy:
+            governorState[index + 2] = min(limits['max'], governorState[index + 2] + RATE_INCREASE)
+        else:
+            governorState[index + 2] = max(limits['min'], governorState[index + 2] * RATE_DECREASE)
+        # every thread and worker holds off until the server is ready again, not just the one that was told,
+        # and then they go out one by one at the host's rate rather than all at once
+        if retryAfter is not None:
+            blockedUntil = time.monotonic() + retryAfter
+            if blockedUntil > governorState[index + 1]:
+                governorState[index] = 0.0
+                governorState[index + 1] = blockedUntil
+
+def getRetryAfter(response):
+    # either a number of seconds or an HTTP date
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+def getHttpSession():
+    global httpSession, httpSessionPid
+    with httpSessionLock:
+        if httpSession is None or httpSessionPid != os.getpid():
+            httpSession = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(HOST_LIMITS), pool_maxsize=MAX_CONCURRENT_REQUESTS)
+            httpSession.mount('http://', adapter)
+            httpSession.mount('https://', adapter)
+            httpSessionPid = os.getpid()
+        return httpSession
+
+def sendRequest(url, params, headers, endpoint):
+    host = getHost(url)
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt > 0:
+            recordRequest(endpoint, retries=1)
+            # full jitter, so threads and workers that failed together don't all retry together
+            time.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** (attempt - 1)))
+        
+        waitTime = waitForRateLimit(host)
+        start = time.perf_counter()
+        try:
+            response = getHttpSession().get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            recordRequest(endpoint, requests=1, errors=1, seconds=time.perf_counter() - start, waitSeconds=waitTime)
+            updateRateLimit(host, False)
+            error = e
+            continue
+        except requests.exceptions.RequestException:
+            recordRequest(endpoint, requests=1, errors=1, seconds=time.perf_counter() - start, waitSeconds=waitTime)
+            raise
+        recordRequest(endpoint, requests=1, bytes=len(response.content), seconds=time.perf_counter() - start, waitSeconds=waitTime)
+        
+        if response.status_code not in RETRY_STATUSES:
+            updateRateLimit(host, True)
+            return response
+        
+        recordRequest(endpoint, errors=1)
+        updateRateLimit(host, False, getRetryAfter(response))
+        error = requests.exceptions.HTTPError(f"{response.status_code} error for url: {url}", response=response)
+    
+    raise error
+
+def getCacheTtl(url, data):
+    mrData = data.get('MRData') if isinstance(data, dict) else None
+    if mrData is not None and mrData.get('total') == '0':
+        return EMPTY_RESPONSE_TTL
+    
+    for pattern, ttl in CACHE_TTLS:
+        if re.search(pattern, url):
+            return ttl
+    return DEFAULT_CACHE_TTL
+
+def getCachePath(url, params):
+    keyText = url + '?' + json.dumps(params or {}, sort_keys=True)
+    return os.path.join(CACHE_DIR, hashlib.sha256(keyText.encode()).hexdigest() + '.json')
+
+def readCacheEntry(path):
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        # touching the file on every read keeps the eviction order least-recently-used
+        os.utime(path)
+        return entry
+    except (OSError, ValueError):
+        return None
+
+def writeCacheEntry(path, entry):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmpPath = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmpPath, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmpPath, path)
+
+def evictCache():
+    if not os.path.isdir(CACHE_DIR):
+        return
+    
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.json'):
+            path = os.path.join(CACHE_DIR, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    
+    totalBytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if totalBytes <= MAX_CACHE_BYTES:
+            break
+        os.remove(path)
+        totalBytes -= size
+
+def fetchJson(url, params=None, headers=None, maxAge=None):
+    # maxAge overrides the cache TTL, maxAge=0 always asks the server, with a conditional request if possible
+    endpoint = getEndpointName(url, params)
+    cachePath = getCachePath(url, params)
+    entry = readCacheEntry(cachePath)
+    
+    if entry is not None:
+        ttl = entry['ttl'] if maxAge is None else maxAge
+        isFresh = ttl is None or time.time() - entry['fetchedAt'] < ttl
+        if isFresh or OFFLINE:
+            recordRequest(endpoint, cacheHits=1)
+            return entry['data']
+    elif OFFLINE:
+        recordRequest(endpoint, errors=1)
+        raise requests.exceptions.ConnectionError(f"Offline and not cached: {url}")
+    
+    requestHeaders = dict(headers or {})
+    if entry is not None:
+        if entry.get('etag'):
+            requestHeaders['If-None-Match'] = entry['etag']
+        if entry.get('lastModified'):
+            requestHeaders['If-Modified-Since'] = entry['lastModified']
+    
+    response = sendRequest(url, params, requestHeaders, endpoint)
+    
+    if response.status_code == 304 and entry is not None:
+        recordRequest(endpoint, revalidated=1)
+        entry['fetchedAt'] = time.time()
+        writeCacheEntry(cachePath, entry)
+        return entry['data']
+    
+    if not response.ok:
+        recordRequest(endpoint, errors=1)
+    response.raise_for_status()
+    data = response.json()
+    
+    writeCacheEntry(cachePath, {
+        'url': url,
+        'params': params,
+        'fetchedAt': time.time(),
+        'ttl': getCacheTtl(url, data),
+        'etag': response.headers.get('ETag'),
+        'lastModified': response.headers.get('Last-Modified'),
+        'data': data
+    })
+    return data
+
+def fetchJsonOrError(url, maxAge=None):
+    try:
+        return fetchJson(url, maxAge=maxAge)
+    except Exception as e:
+        return e
+
+def fetchAllJson(urls, maxAge=None):
+    # results come back in the same order as urls, a failed request is returned as its exception
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        return list(executor.map(fetchJsonOrError, urls, [maxAge] * len(urls)))
+
+def fetchAllPages(url, resultsKey, pageSize=100, maxAge=None):
+    # Jolpica caps a page at 100 rows, once the total is known the remaining pages are fetched concurrently
+    firstPage = fetchJson(f"{url}&limit={pageSize}&offset=0", maxAge=maxAge)
+    total = int(firstPage['MRData']['total'])
+    pageUrls = [f"{url}&limit={pageSize}&offset={offset}" for offset in range(pageSize, total, pageSize)]
+    pages = [firstPage] + fetchAllJson(pageUrls, maxAge)
+    
+    races = []
+    for page in pages:
+        if isinstance(page, Exception):
+            raise page
+        
+        # a race can be split across two pages
+        for race in page['MRData']['RaceTable']['Races']:
+            if races and races[-1]['round'] == race['round']:
+                races[-1][resultsKey].extend(race[resultsKey])
+            else:
+                races.append(race)
+    
+    return races
@@ -0,0 +1,51 @@
+from .scoring import getSeasonTable, getRoundScores
+
+# the rolling metrics are taken over each driver's last FORM_WINDOW races, RecentForm lists them
+FORM_WINDOW = 5
+# per-round values and the rolling means they're turned into
+ROLLING_COLUMNS = {
+    'finishPosition': 'avgFinish',
+    'positionsGained': 'avgPositionsGained',
+    'dnf': 'dnfRate',
+    'qualifyingPerformance': 'avgQualifyingPerformance',
+    'racePacePerformance': 'avgRacePace'
+}
+
+def getRollingMeans(formTable, columns, window):
+    # mean of each driver's last `window` values up to every round, a missing value is left out of its windows
+    rolling = formTable.groupby('driverId')[columns].rolling(window, min_periods=1).mean()
+    return rolling.reset_index(level=0, drop=True)
+
+def getFormTable(seasonState, window=FORM_WINDOW):
+    # one row per (driver, round) they raced in, with the rolling metrics up to and including that round
+    seasonTable = getSeasonTable(seasonState)
+    qualiScores, raceScores = getRoundScores(seasonTable)
+    
+    formTable = seasonTable.loc[seasonTable['raceOrder'].notna(), ['driverId', 'round', 'raceName', 'qualiPos', 'raceOrder', 'racePositionText']]
+    # retirements, disqualifications and the like aren't finishes
+    isClassified = formTable['racePositionText'].fillna('').str.isdigit()
+    finishPosition = formTable['raceOrder'].where(isClassified)
+    formTable = formTable.assign(
+        finishPosition=finishPosition,
+        positionsGained=formTable['qualiPos'] - finishPosition,
+        dnf=(~isClassified).astype(float),
+        # scores line up with the season table's index, rows without one are left empty
+        qualifyingPerformance=qualiScores['performance'],
+        racePacePerformance=raceScores['racePacePerformance']
+    )
+    formTable = formTable.sort_values(['driverId', 'round'])
+    
+    rolling = getRollingMeans(formTable, list(ROLLING_COLUMNS), window).rename(columns=ROLLING_COLUMNS)
+    formTable = formTable.drop(columns='racePositionText').join(rolling.round(2))
+    return formTable.reset_index(drop=True)
+
+def getLatestForm(formTable):
+    # every driver's rolling metrics after the latest round they raced in
+    return formTable.groupby('driverId').tail(1).set_index('driverId')[list(ROLLING_COLUMNS.values())]
+
+def getRecentForm(formTable, window=FORM_WINDOW):
+    # {driverId: [{'raceName', 'position'}, ...]} over the last `window` races, most recent first
+    recentRaces = formTable.groupby('driverId').tail(window).iloc[::-1]
+    # the classified order like the API's position, retirements included, not the scoring's placeholder
+    recentRaces = recentRaces[['driverId', 'raceName']].assign(position=recentRaces['raceOrder'].astype(int).astype(str))
+    return {driverId: races.drop(columns='driverId').to_dict('records') for driverId, races in recentRaces.groupby('driverId', sort=False)}
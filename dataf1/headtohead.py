@@ -0,0 +1,77 @@
+import numpy as np
+
+from .scoring import getSeasonTable
+from .season import getResultsTable
+
+# every pair of drivers compared across all rounds at once: positions are laid out as a rounds x drivers
+# array and broadcast against themselves into rounds x drivers x drivers, entry [r, i, j] compares driver i
+# with driver j in round r; the matrices below are summed or averaged over the rounds, so entry [i, j] is
+# i's record against j and a pair is looked up by index
+#   qualiRounds, raceRounds           rounds both drivers qualified / started the race in
+#   qualiAhead, raceAhead             of those, the rounds i was ahead of j in
+#   qualiGap, raceGap                 i's average position minus j's, negative when i is usually ahead
+#   teammateRounds                    rounds they raced for the same team in
+#   teammateQualiAhead, ...RaceAhead  qualiAhead and raceAhead over those rounds only
+MATRIX_NAMES = ['qualiRounds', 'qualiAhead', 'qualiGap', 'raceRounds', 'raceAhead', 'raceGap', 'teammateRounds', 'teammateQualiAhead', 'teammateRaceAhead']
+# roundPoints is rounds x drivers, every driver's race and sprint points in every round; a pair's points
+# difference per round is taken when the pair is looked up, kept for every pair it would grow with the
+# square of the drivers
+
+def getRoundDriverArray(shape, roundIndex, driverIndex, values, fillValue=np.nan):
+    array = np.full(shape, fillValue, dtype=values.dtype)
+    array[roundIndex, driverIndex] = values
+    return array
+
+def comparePositions(positions, pairMask):
+    # counts and average gap over the rounds where pairMask holds and both drivers have a position
+    first = positions[:, :, None]
+    second = positions[:, None, :]
+    both = pairMask & ~np.isnan(first) & ~np.isnan(second)
+    rounds = both.sum(axis=0)
+    ahead = (both & (first < second)).sum(axis=0)
+    gapSum = np.where(both, first - second, 0).sum(axis=0)
+    gap = np.divide(gapSum, rounds, out=np.full(rounds.shape, np.nan), where=rounds > 0)
+    return rounds, ahead, gap
+
+def getHeadToHead(seasonState):
+    seasonTable = getSeasonTable(seasonState)
+    driverIds = np.array(sorted(seasonTable['driverId'].unique()), dtype=str)
+    rounds = np.array(sorted(seasonTable['round'].unique()), dtype=int)
+    shape = (len(rounds), len(driverIds))
+    roundIndex = np.searchsorted(rounds, seasonTable['round'].to_numpy())
+    driverIndex = np.searchsorted(driverIds, seasonTable['driverId'].to_numpy(dtype=str))
+    
+    qualiPositions = getRoundDriverArray(shape, roundIndex, driverIndex, seasonTable['qualiPos'].to_numpy(dtype=float))
+    # the classified order, retirements included, so any driver who started is compared
+    racePositions = getRoundDriverArray(shape, roundIndex, driverIndex, seasonTable['raceOrder'].to_numpy(dtype=float))
+    # teams as integer codes, -1 where a driver didn't race
+    teamCodes = seasonTable['raceConstructorId'].astype('category').cat.codes.to_numpy()
+    teams = getRoundDriverArray(shape, roundIndex, driverIndex, teamCodes, fillValue=-1)
+    
+    # race and sprint points of the scored rounds
+    resultsTable = getResultsTable(seasonState)
+    roundPoints = resultsTable[resultsTable['round'].isin(rounds) & resultsTable['driverId'].isin(driverIds)].groupby(['round', 'driverId'])['points'].sum()
+    points = np.zeros(shape)
+    points[np.searchsorted(rounds, roundPoints.index.get_level_values('round')), np.searchsorted(driverIds, roundPoints.index.get_level_values('driverId').to_numpy(dtype=str))] = roundPoints.to_numpy()
+    
+    allPairs = np.ones((1, len(driverIds), len(driverIds)), dtype=bool)
+    teammates = (teams[:, :, None] == teams[:, None, :]) & (teams[:, :, None] >= 0)
+    qualiRounds, qualiAhead, qualiGap = comparePositions(qualiPositions, allPairs)
+    raceRounds, raceAhead, raceGap = comparePositions(racePositions, allPairs)
+    _, teammateQualiAhead, _ = comparePositions(qualiPositions, teammates)
+    teammateRounds, teammateRaceAhead, _ = comparePositions(racePositions, teammates)
+    
+    return {
+        'driverIds': driverIds,
+        'rounds': rounds,
+        'qualiRounds': qualiRounds.astype(np.int16),
+        'qualiAhead': qualiAhead.astype(np.int16),
+        'qualiGap': qualiGap.astype(np.float32),
+        'raceRounds': raceRounds.astype(np.int16),
+        'raceAhead': raceAhead.astype(np.int16),
+        'raceGap': raceGap.astype(np.float32),
+        'teammateRounds': teammateRounds.astype(np.int16),
+        'teammateQualiAhead': teammateQualiAhead.astype(np.int16),
+        'teammateRaceAhead': teammateRaceAhead.astype(np.int16),
+        'roundPoints': points.astype(np.float32)
+    }
@@ -0,0 +1,95 @@
+import contextlib
+import copy
+import json
+import logging
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# stage timings and per-endpoint request counts of a run, see writeRunReport
+RUN_REPORT = 'run-report.json'
+
+# seconds spent in each stage of buildSeason, the stages reused from an earlier run and
+# what each endpoint cost, reset for every season
+ENDPOINT_COUNTERS = ['requests', 'retries', 'cacheHits', 'revalidated', 'errors', 'bytes', 'seconds', 'waitSeconds']
+runMetrics = {'stages': {}, 'reusedStages': [], 'endpoints': {}}
+metricsLock = threading.Lock()
+
+def resetMetrics():
+    with metricsLock:
+        runMetrics['stages'] = {}
+        runMetrics['reusedStages'] = []
+        runMetrics['endpoints'] = {}
+
+def getMetrics():
+    with metricsLock:
+        return copy.deepcopy(runMetrics)
+
+def mergeMetrics(total, metrics):
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            mergeMetrics(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+@contextlib.contextmanager
+def timeStage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with metricsLock:
+            runMetrics['stages'][name] = runMetrics['stages'].get(name, 0.0) + time.perf_counter() - start
+
+def recordReusedStage(name):
+    with metricsLock:
+        runMetrics['reusedStages'].append(name)
+
+def recordRequest(endpoint, **counts):
+    with metricsLock:
+        stats = runMetrics['endpoints'].setdefault(endpoint, dict.fromkeys(ENDPOINT_COUNTERS, 0))
+        for name, value in counts.items():
+            stats[name] += value
+
+def setupLogging(verbosity):
+    # warnings only by default, -v for progress and -vv for per-driver scores
+    logLevel = [logging.WARNING, logging.INFO, logging.DEBUG][min(verbosity, 2)]
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s %(message)s')
+    logging.getLogger('dataf1').setLevel(logLevel)
+
+def getSeasonReport(output, metrics):
+    seasonReport = {'output': None, 'error': None, 'stages': {}, 'reusedStages': sorted(metrics['reusedStages']), 'endpoints': {}}
+    if isinstance(output, Exception):
+        seasonReport['error'] = f"{type(output).__name__}: {output}"
+    else:
+        seasonReport['output'] = output
+    seasonReport['stages'] = {name: round(seconds, 3) for name, seconds in metrics['stages'].items()}
+    for endpoint, stats in sorted(metrics['endpoints'].items()):
+        seasonReport['endpoints'][endpoint] = {name: round(value, 3) if isinstance(value, float) else value for name, value in stats.items()}
+    return seasonReport
+
+def writeRunReport(path, startedAt, wallTime, seasonReports):
+    stages = {}
+    endpoints = {}
+    for seasonReport in seasonReports.values():
+        mergeMetrics(stages, seasonReport['stages'])
+        mergeMetrics(endpoints, seasonReport['endpoints'])
+    
+    report = {
+        'startedAt': startedAt,
+        'command': sys.argv,
+        'wallTime': round(wallTime, 3),
+        'failedSeasons': [year for year, seasonReport in seasonReports.items() if seasonReport['error']],
+        'stages': {name: round(seconds, 3) for name, seconds in stages.items()},
+        'endpoints': {endpoint: {name: round(value, 3) for name, value in stats.items()} for endpoint, stats in endpoints.items()},
+        'totals': {name: round(sum(stats[name] for stats in endpoints.values()), 3) for name in ENDPOINT_COUNTERS},
+        'seasons': seasonReports
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    
+    totals = report['totals']
+    log.info(f"{totals['requests']} requests ({totals['bytes'] / 1024:.1f} KiB), {totals['cacheHits']} cache hits, {totals['errors']} errors in {report['wallTime']:.1f}s, report written to {path}")
@@ -0,0 +1,128 @@
+import filecmp
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .form import ROLLING_COLUMNS
+from .headtohead import MATRIX_NAMES
+from .season import getResultsTable
+from .standings import computeStandings
+
+log = logging.getLogger(__name__)
+
+OUTPUT_CSV = 'drivers-{year}.csv'
+# the build before the current one, in case a bad build has to be rolled back by hand
+BACKUP_CSV = 'drivers-{year}-backup.csv'
+# typed long-format tables (Parquet) and one compact JSON file per driver for the dashboard
+OUTPUT_DIR = 'drivers-{year}'
+
+def getOutputTables(driversDf, seasonState, allRaceResults, formTable):
+    driverTable = driversDf.drop(columns=['RecentForm', 'AllPositions', 'SeasonResults'])
+    driverTable = driverTable.astype({'Championships': int, 'Wins': int, 'Podiums': int, 'Entries': int})
+    
+    seasonResults = getResultsTable(seasonState)
+    standingsTable = computeStandings(seasonResults, 'driverId')
+    standingsTable = standingsTable[standingsTable['driverId'].isin(driverTable['driverId'])]
+    
+    resultsTable = pd.DataFrame(
+        [dict(result, driverId=driverId) for driverId, results in allRaceResults.items() for result in results],
+        columns=['driverId', 'round', 'country', 'racePosition', 'qualiPosition']
+    )
+    resultsTable = resultsTable.astype({'round': int, 'racePosition': int, 'qualiPosition': int})
+    # the team a driver raced for in each round, drivers can change teams mid-season
+    raceConstructors = seasonResults.loc[seasonResults['session'] == 'race', ['round', 'driverId', 'constructorId']]
+    resultsTable = resultsTable.merge(raceConstructors, on=['round', 'driverId'], how='left')
+    # and their rolling form up to that round
+    resultsTable = resultsTable.merge(formTable[['driverId', 'round'] + list(ROLLING_COLUMNS.values())], on=['driverId', 'round'], how='left')
+    resultsTable = resultsTable[resultsTable['driverId'].isin(driverTable['driverId'])]
+    
+    return driverTable, standingsTable.reset_index(drop=True), resultsTable.reset_index(drop=True)
+
+def writeCsv(year, driversDf):
+    # both files are swapped in with os.replace, so the dashboard never reads a half-written CSV
+    outputCsv = OUTPUT_CSV.format(year=year)
+    backupCsv = BACKUP_CSV.format(year=year)
+    tmpPath = outputCsv + '.tmp'
+    driversDf.to_csv(tmpPath, index=False)
+    
+    if not os.path.exists(outputCsv):
+        os.replace(tmpPath, outputCsv)
+        return
+    
+    # an unchanged build keeps the older backup
+    if filecmp.cmp(tmpPath, outputCsv, shallow=False):
+        os.remove(tmpPath)
+        return
+    
+    shutil.copyfile(outputCsv, backupCsv + '.tmp')
+    os.replace(backupCsv + '.tmp', backupCsv)
+    os.replace(tmpPath, outputCsv)
+
+def writeJson(path, data):
+    # numpy scalars are written as their plain Python value
+    tmpPath = path + '.tmp'
+    with open(tmpPath, 'w') as f:
+        json.dump(data, f, separators=(',', ':'), default=lambda value: value.item())
+    os.replace(tmpPath, path)
+
+def writeHeadToHead(year, headToHead):
+    # NumPy arrays for in-process use and JSON for the dashboard, in both a pair is [i][j] with i and j
+    # the drivers' positions in driverIds and roundPoints is [round][i] (see headtohead.py)
+    outputDir = OUTPUT_DIR.format(year=year)
+    os.makedirs(outputDir, exist_ok=True)
+    
+    npzPath = os.path.join(outputDir, 'h2h.npz')
+    with open(npzPath + '.tmp', 'wb') as f:
+        np.savez_compressed(f, **headToHead)
+    os.replace(npzPath + '.tmp', npzPath)
+    
+    matrices = {}
+    for name in MATRIX_NAMES:
+        matrix = headToHead[name]
+        if matrix.dtype.kind == 'f':
+            # gaps without any rounds to average over are null
+            matrix = np.where(np.isnan(matrix), None, matrix.astype(float).round(2))
+        matrices[name] = matrix.tolist()
+    writeJson(os.path.join(outputDir, 'h2h.json'), {
+        'driverIds': headToHead['driverIds'].tolist(),
+        'rounds': headToHead['rounds'].tolist(),
+        **matrices,
+        'roundPoints': headToHead['roundPoints'].astype(float).round(2).tolist()
+    })
+
+def writeOutputTables(year, driverTable, standingsTable, resultsTable):
+    outputDir = OUTPUT_DIR.format(year=year)
+    os.makedirs(outputDir, exist_ok=True)
+    
+    try:
+        driverTable.to_parquet(os.path.join(outputDir, 'drivers.parquet'), index=False)
+        standingsTable.to_parquet(os.path.join(outputDir, 'standings.parquet'), index=False)
+        resultsTable.to_parquet(os.path.join(outputDir, 'results.parquet'), index=False)
+    except ImportError as e:
+        log.warning(f"Skipping Parquet output: {e}")
+    
+    # to_json also turns missing values into null
+    drivers = json.loads(driverTable.to_json(orient='records'))
+    
+    # each shard stores its standings and results as one array per column instead of one object per round
+    standingsByDriver = dict(list(standingsTable.groupby('driverId')))
+    resultsByDriver = dict(list(resultsTable.groupby('driverId')))
+    for driver in drivers:
+        driverId = driver['driverId']
+        shard = {'driver': driver, 'standings': {}, 'results': {}}
+        
+        if driverId in standingsByDriver:
+            shard['standings'] = standingsByDriver[driverId].drop(columns='driverId').to_dict('list')
+        if driverId in resultsByDriver:
+            driverResults = resultsByDriver[driverId].drop(columns='driverId')
+            # missing values as null rather than NaN, which isn't JSON
+            shard['results'] = driverResults.astype(object).where(driverResults.notna(), None).to_dict('list')
+        
+        writeJson(os.path.join(outputDir, f"{driverId}.json"), shard)
+    
+    # the index goes last, so a new index.json means the whole directory is up to date (see server.py)
+    writeJson(os.path.join(outputDir, 'index.json'), drivers)
@@ -0,0 +1,153 @@
+import gc
+import json
+import logging
+import os
+
+import pandas as pd
+
+from . import fetch
+from .output import writeJson
+from .season import getCircuits
+from .sessions import getSessionLaps
+
+log = logging.getLogger(__name__)
+
+# each race session is reduced to per-driver pace once and kept under CACHE_DIR/PACE_CACHE_DIR, so later
+# builds only load the sessions of new rounds; PACE_VERSION is bumped whenever the lap filter changes
+PACE_CACHE_DIR = 'pace'
+PACE_VERSION = 1
+# fastf1 has no lap timing before this season
+FIRST_LAP_TIMES_SEASON = 2018
+# a driver needs this many representative laps in the same conditions for their pace in a session to count
+MIN_LAPS = 5
+# laps slower than this fraction of the fastest one in the same conditions are traffic, damage or a mistake
+SLOW_LAP_CUTOFF = 1.07
+WET_COMPOUNDS = ['INTERMEDIATE', 'WET']
+
+# (layout, speed) by Jolpica circuitId, circuits that aren't listed only count towards the overall pace
+CIRCUIT_CATEGORIES = {
+    'albert_park': ('street', 'mid'),
+    'americas': ('permanent', 'mid'),
+    'bahrain': ('permanent', 'mid'),
+    'baku': ('street', 'high'),
+    'catalunya': ('permanent', 'mid'),
+    'hockenheimring': ('permanent', 'mid'),
+    'hungaroring': ('permanent', 'low'),
+    'imola': ('permanent', 'mid'),
+    'interlagos': ('permanent', 'mid'),
+    'istanbul': ('permanent', 'mid'),
+    'jeddah': ('street', 'high'),
+    'losail': ('permanent', 'high'),
+    'madring': ('street', 'mid'),
+    'marina_bay': ('street', 'low'),
+    'miami': ('street', 'mid'),
+    'monaco': ('street', 'low'),
+    'monza': ('permanent', 'high'),
+    'mugello': ('permanent', 'high'),
+    'nurburgring': ('permanent', 'mid'),
+    'portimao': ('permanent', 'mid'),
+    'red_bull_ring': ('permanent', 'high'),
+    'ricard': ('permanent', 'mid'),
+    'rodriguez': ('permanent', 'mid'),
+    'sepang': ('permanent', 'mid'),
+    'shanghai': ('permanent', 'mid'),
+    'silverstone': ('permanent', 'high'),
+    'sochi': ('street', 'mid'),
+    'spa': ('permanent', 'high'),
+    'suzuka': ('permanent', 'high'),
+    'vegas': ('street', 'high'),
+    'villeneuve': ('street', 'low'),
+    'yas_marina': ('permanent', 'mid'),
+    'zandvoort': ('permanent', 'mid')
+}
+
+# a driver's average gap to the fastest driver of each race, as a percentage of lap time, lower is faster;
+# everything but WetPace is over dry laps only
+PACE_COLUMNS = ['LapPace', 'WetPace', 'StreetPace', 'HighSpeedPace', 'MidSpeedPace', 'LowSpeedPace']
+SESSION_PACE_COLUMNS = ['code', 'wet', 'laps', 'medianLapTime', 'gap']
+
+def getRepresentativeLaps(laps, weather):
+    # green-flag laps that neither start nor end in the pit lane, without the standing start
+    isRepresentative = (
+        laps['LapTime'].notna()
+        & laps['Time'].notna()
+        & laps['PitInTime'].isna()
+        & laps['PitOutTime'].isna()
+        & (laps['LapNumber'] > 1)
+        & (laps['TrackStatus'] == '1')
+    )
+    laps = laps.loc[isRepresentative, ['Driver', 'LapTime', 'Time', 'Compound']].sort_values('Time')
+    
+    # a lap is wet on intermediates or full wets, or when it was raining as it ended
+    isWet = laps['Compound'].isin(WET_COMPOUNDS).to_numpy()
+    if weather is not None and not weather.empty:
+        rainfall = pd.merge_asof(laps[['Time']], weather[['Time', 'Rainfall']].sort_values('Time'), on='Time')['Rainfall']
+        isWet = isWet | rainfall.fillna(False).astype(bool).to_numpy()
+    
+    laps = pd.DataFrame({'code': laps['Driver'].to_numpy(), 'wet': isWet, 'lapTime': laps['LapTime'].dt.total_seconds().to_numpy()})
+    fastestLap = laps.groupby('wet')['lapTime'].transform('min')
+    return laps[laps['lapTime'] <= fastestLap * SLOW_LAP_CUTOFF]
+
+def aggregateSession(laps, weather):
+    # every driver's median representative lap and its gap to the fastest median in the same conditions
+    representativeLaps = getRepresentativeLaps(laps, weather)
+    paces = representativeLaps.groupby(['code', 'wet'])['lapTime'].agg(laps='size', medianLapTime='median').reset_index()
+    paces = paces[paces['laps'] >= MIN_LAPS]
+    fastestMedian = paces.groupby('wet')['medianLapTime'].transform('min')
+    paces = paces.assign(gap=(paces['medianLapTime'] / fastestMedian - 1) * 100)
+    return paces[SESSION_PACE_COLUMNS].reset_index(drop=True)
+
+def getSessionPace(year, roundNum):
+    path = os.path.join(fetch.CACHE_DIR, PACE_CACHE_DIR, f"{year}-{roundNum:02d}.json")
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+        if stored['version'] == PACE_VERSION:
+            return pd.DataFrame(stored['paces'], columns=SESSION_PACE_COLUMNS)
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    try:
+        paces = aggregateSession(*getSessionLaps(year, roundNum))
+    except Exception as e:
+        # not stored, so the session is tried again by the next build
+        log.warning(f"No lap times for round {roundNum} of {year}: {e}")
+        return None
+    finally:
+        # a session and its laps reference each other, collect them now so only one is ever held in memory
+        gc.collect()
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    writeJson(path, {'version': PACE_VERSION, 'paces': paces.to_dict('list')})
+    return paces
+
+def getSeasonPace(year, rounds):
+    # one row per driver code with the PACE_COLUMNS, a driver with no laps in a split has no value for it
+    if year < FIRST_LAP_TIMES_SEASON:
+        return pd.DataFrame(columns=['code'] + PACE_COLUMNS)
+    
+    circuits = getCircuits(year)
+    sessionPaces = []
+    for roundNum in rounds:
+        paces = getSessionPace(year, roundNum)
+        if paces is None or paces.empty:
+            continue
+        layout, speed = CIRCUIT_CATEGORIES.get(circuits.get(roundNum), (None, None))
+        sessionPaces.append(paces.assign(round=roundNum, layout=layout, speed=speed))
+    
+    if not sessionPaces:
+        return pd.DataFrame(columns=['code'] + PACE_COLUMNS)
+    paces = pd.concat(sessionPaces, ignore_index=True)
+    
+    isDry = ~paces['wet'].astype(bool)
+    splits = {
+        'LapPace': isDry,
+        'WetPace': ~isDry,
+        'StreetPace': isDry & (paces['layout'] == 'street'),
+        'HighSpeedPace': isDry & (paces['speed'] == 'high'),
+        'MidSpeedPace': isDry & (paces['speed'] == 'mid'),
+        'LowSpeedPace': isDry & (paces['speed'] == 'low')
+    }
+    # every race counts the same, however many laps a driver had in it
+    seasonPace = pd.DataFrame({name: paces[rows].groupby('code')['gap'].mean() for name, rows in splits.items()}, columns=PACE_COLUMNS)
+    return seasonPace.round(2).rename_axis('code').reset_index()
@@ -0,0 +1,240 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from . import fetch, sessions
+from .career import getAllCareerStats
+from .drivers import getDrivers
+from .form import getFormTable, getLatestForm, getRecentForm
+from .instrumentation import timeStage, resetMetrics, getMetrics, setupLogging
+from .headtohead import getHeadToHead
+from .output import OUTPUT_CSV, getOutputTables, writeCsv, writeHeadToHead, writeOutputTables
+from .pace import PACE_COLUMNS, getSeasonPace
+from .season import newSeasonState, loadSeasonState, saveSeasonState, getRoundCount, getLatestRound, getProcessedRounds, updateSeasonState
+from .scoring import scoreSeason
+from .sessions import FALLBACK_HEADSHOT_URL, getHeadshots, getTeams
+from .stages import runStages
+from .store import writeSeasonStore
+from .standings import getAllStandings
+
+log = logging.getLogger(__name__)
+
+CAREER_TYPES = {'Championships': int, 'Wins': int, 'Podiums': int, 'Points': float, 'Entries': int}
+CAREER_COLUMNS = list(CAREER_TYPES)
+# the latest rolling metrics of form.py, as they're named in the output
+FORM_COLUMNS = {
+    'avgFinish': 'AvgFinish',
+    'avgPositionsGained': 'PositionsGained',
+    'dnfRate': 'DnfRate',
+    'avgQualifyingPerformance': 'FormQualifyingPerformance',
+    'avgRacePace': 'FormRacePace'
+}
+# after the columns of the season's driver list
+OUTPUT_COLUMNS = ['Headshot'] + CAREER_COLUMNS + ['RecentForm', 'AllPositions', 'SeasonResults', 'QualifyingPerformance', 'RacePace'] + list(FORM_COLUMNS.values()) + PACE_COLUMNS + ['TeamName', 'TeamColour']
+
+def buildSeason(year, incremental=False):
+    outputCsv = OUTPUT_CSV.format(year=year)
+    seasonState = None
+    existingDrivers = pd.DataFrame(columns=['driverId', 'code', 'Headshot'])
+    
+    if incremental:
+        seasonState = loadSeasonState(year)
+        if seasonState is not None and os.path.exists(outputCsv):
+            existingDrivers = pd.read_csv(outputCsv)
+        else:
+            log.info(f"No previous build found for {outputCsv}, running a full build")
+            seasonState = None
+    
+    # the fetching stages' stored results are only reused until another round has been run
+    try:
+        latestRound = getLatestRound(year)
+    except IndexError:
+        latestRound = 0
+    
+    if seasonState is None:
+        seasonState = newSeasonState(year)
+        standingsRounds = range(1, getRoundCount(year) + 1)
+        resultsRounds = standingsRounds
+        maxAge = None
+    else:
+        # every round left to fetch has been run, so a cached empty response for it (or a cached
+        # sprint query from before it) is out of date
+        maxAge = 0
+        standingsRounds = [roundNum for roundNum in range(1, latestRound + 1) if roundNum not in seasonState['resultsTableRounds']]
+        resultsRounds = [roundNum for roundNum in range(1, latestRound + 1) if roundNum not in seasonState['qualifyingRounds']]
+        
+        if not standingsRounds and not resultsRounds:
+            log.info(f"{outputCsv} is already up to date with round {latestRound}")
+            return outputCsv
+        log.info(f"Refreshing standings for rounds {standingsRounds} and results for rounds {resultsRounds}")
+    
+    # drivers already in the previous build keep their headshot and career stats
+    knownDrivers = existingDrivers.set_index('driverId')
+    knownHeadshots = existingDrivers[['code', 'Headshot']].rename(columns={'code': 'Abbreviation', 'Headshot': 'HeadshotUrl'})
+    
+    stages = {
+        'drivers': {
+            'deps': [],
+            'run': lambda: getDrivers(year),
+            'key': lambda: latestRound,
+            'complete': lambda drivers: not drivers.empty
+        },
+        'career stats': {
+            'deps': ['drivers'],
+            'run': lambda drivers: getAllCareerStats(getNewDriverUrls(drivers, knownDrivers)),
+            'key': lambda drivers: (getNewDriverUrls(drivers, knownDrivers), latestRound),
+            'complete': lambda careerStats: all(stats['Entries'] > 0 for stats in careerStats.values())
+        },
+        'headshots': {
+            'deps': ['drivers'],
+            'run': lambda drivers: getNewHeadshots(year, getMissingCodes(drivers, knownHeadshots)),
+            'key': lambda drivers: (getMissingCodes(drivers, knownHeadshots), latestRound),
+            'complete': lambda headshots: not (headshots['HeadshotUrl'] == FALLBACK_HEADSHOT_URL).all()
+        },
+        'teams': {
+            'deps': [],
+            'run': lambda: getTeams(year),
+            'key': lambda: latestRound,
+            'complete': bool
+        },
+        # fetches whatever rounds are missing into seasonState, which is saved with the build rather than as a stage
+        'season state': {
+            'deps': [],
+            'run': lambda: updateSeasonState(standingsRounds, resultsRounds, seasonState, maxAge)
+        },
+        # the ones computed from the season state are keyed by the tables themselves
+        'standings': {
+            'deps': ['season state'],
+            'run': getAllStandings,
+            'key': lambda seasonState: (seasonState['resultsTableRounds'], seasonState['resultsTable'])
+        },
+        'season results': {
+            'deps': ['season state'],
+            'run': scoreSeason,
+            'key': getSeasonStateKey
+        },
+        'form': {
+            'deps': ['season state'],
+            'run': getFormTable,
+            'key': getSeasonStateKey
+        },
+        'head to head': {
+            'deps': ['season state'],
+            'run': getHeadToHead,
+            'key': getSeasonStateKey
+        },
+        # memoized per session by pace.py
+        'lap pace': {
+            'deps': ['season state'],
+            'run': lambda seasonState: getSeasonPace(year, sorted(getProcessedRounds(seasonState)))
+        }
+    }
+    results = runStages(year, stages)
+    
+    seasonDrivers = results['drivers']
+    if seasonDrivers.empty:
+        raise RuntimeError(f"No drivers for {year}, keeping the previous {outputCsv}")
+    careerStats = results['career stats']
+    headshotUrls = pd.concat([knownHeadshots, results['headshots']], ignore_index=True)
+    driverTeams = results['teams']
+    allStandings = results['standings']
+    driverSkills, allRaceResults = results['season results']
+    formTable = results['form']
+    paceTable = results['lap pace']
+    headToHead = results['head to head']
+    seasonState['allStandings'] = allStandings
+    
+    log.debug(f"Standings: {allStandings}")
+    
+    with timeStage('assemble'):
+        careerTable = getCareerTable(seasonDrivers, knownDrivers, careerStats)
+        driversDf = getDriversTable(seasonDrivers, careerTable, headshotUrls, driverTeams, driverSkills, allStandings, allRaceResults, formTable, paceTable)
+    log.debug(f"Drivers:\n{driversDf}")
+    with timeStage('write output'):
+        writeCsv(year, driversDf)
+        writeHeadToHead(year, headToHead)
+        writeOutputTables(year, *getOutputTables(driversDf, seasonState, allRaceResults, formTable))
+        writeSeasonStore(seasonState, driversDf)
+        saveSeasonState(seasonState)
+    
+    return outputCsv
+
+def getSeasonStateKey(seasonState):
+    return (seasonState['roundsTable'], seasonState['resultsTableRounds'], seasonState['resultsTable'], seasonState['qualifyingRounds'], seasonState['qualifyingTable'])
+
+def getCareerTable(seasonDrivers, knownDrivers, careerStats):
+    # known drivers keep the career stats of the previous build, the rest have just been fetched by url
+    knownStats = knownDrivers.reindex(columns=CAREER_COLUMNS).reset_index()
+    newStats = pd.DataFrame(list(careerStats.values()), columns=CAREER_COLUMNS)
+    newStats.insert(0, 'url', list(careerStats))
+    newStats = seasonDrivers[['driverId', 'url']].merge(newStats, on='url').drop(columns='url')
+    
+    careerTables = [table for table in [knownStats, newStats] if not table.empty]
+    if not careerTables:
+        return pd.DataFrame(columns=['driverId'] + CAREER_COLUMNS).astype(CAREER_TYPES)
+    return pd.concat(careerTables, ignore_index=True).drop_duplicates('driverId').astype(CAREER_TYPES)
+
+def getListColumn(driverIds, values):
+    return [values.get(driverId, []) for driverId in driverIds]
+
+def getDriversTable(seasonDrivers, careerTable, headshotUrls, driverTeams, driverSkills, allStandings, allRaceResults, formTable, paceTable):
+    # every table is keyed by driverId or code and left-joined onto the season's drivers, so a driver
+    # missing from one of them gets that table's defaults
+    headshotTable = headshotUrls.drop_duplicates('Abbreviation').rename(columns={'Abbreviation': 'code', 'HeadshotUrl': 'Headshot'})
+    teamTable = pd.DataFrame.from_dict(driverTeams, orient='index', columns=['teamName', 'teamColour'])
+    teamTable = teamTable.rename(columns={'teamName': 'TeamName', 'teamColour': 'TeamColour'}).rename_axis('code').reset_index()
+    skillTable = pd.DataFrame.from_dict(driverSkills, orient='index', columns=['avgQualifyingPerformance', 'avgRacePace'], dtype=float)
+    skillTable = skillTable.rename(columns={'avgQualifyingPerformance': 'QualifyingPerformance', 'avgRacePace': 'RacePace'}).rename_axis('driverId').reset_index()
+    latestForm = getLatestForm(formTable).rename(columns=FORM_COLUMNS).reset_index()
+    
+    driversDf = seasonDrivers.merge(headshotTable, on='code', how='left')
+    driversDf = driversDf.merge(careerTable, on='driverId', how='left')
+    driversDf = driversDf.merge(skillTable, on='driverId', how='left')
+    driversDf = driversDf.merge(latestForm, on='driverId', how='left')
+    # no default for lap pace, a driver without laps in a split is left empty rather than given a gap
+    driversDf = driversDf.merge(paceTable, on='code', how='left')
+    driversDf = driversDf.merge(teamTable, on='code', how='left')
+    # lists can't be merged in or filled, they're looked up by driverId
+    driversDf['RecentForm'] = getListColumn(driversDf['driverId'], getRecentForm(formTable))
+    driversDf['AllPositions'] = getListColumn(driversDf['driverId'], allStandings)
+    driversDf['SeasonResults'] = getListColumn(driversDf['driverId'], allRaceResults)
+    
+    driversDf = driversDf.fillna({column: 0 for column in CAREER_COLUMNS + ['QualifyingPerformance', 'RacePace'] + list(FORM_COLUMNS.values())})
+    driversDf = driversDf.fillna({'Headshot': '', 'TeamName': 'Unknown', 'TeamColour': '808080'})
+    driversDf = driversDf.astype(CAREER_TYPES)
+    return driversDf[list(seasonDrivers.columns) + OUTPUT_COLUMNS]
+
+def getNewDriverUrls(seasonDrivers, knownDrivers):
+    return seasonDrivers.loc[~seasonDrivers['driverId'].isin(knownDrivers.index), 'url'].tolist()
+
+def getMissingCodes(seasonDrivers, knownHeadshots):
+    return seasonDrivers.loc[~seasonDrivers['code'].isin(knownHeadshots['Abbreviation']), 'code'].tolist()
+
+def getNewHeadshots(year, codes):
+    if not codes:
+        return pd.DataFrame(columns=['Abbreviation', 'HeadshotUrl'])
+    return getHeadshots(year, codes)
+
+def initBackfillWorker(sharedGovernorState, cacheDir, offline, fastf1Offline, verbosity):
+    fetch.governorState = sharedGovernorState
+    fetch.CACHE_DIR = cacheDir
+    fetch.OFFLINE = offline
+    sessions.FASTF1_OFFLINE = fastf1Offline
+    setupLogging(verbosity)
+
+def buildSeasonOrError(year, incremental):
+    # every season gets its own stage timings and request counts in the run report
+    resetMetrics()
+    try:
+        output = buildSeason(year, incremental)
+    except Exception as e:
+        output = e
+    return output, getMetrics()
+
+def runBackfill(seasons, workers, incremental=False, verbosity=0):
+    # one season per worker process, all of them share the request budget and the on-disk cache
+    initArgs = (fetch.getGovernorState(), fetch.CACHE_DIR, fetch.OFFLINE, sessions.FASTF1_OFFLINE, verbosity)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initBackfillWorker, initargs=initArgs) as executor:
+        return list(executor.map(buildSeasonOrError, seasons, [incremental] * len(seasons)))
@@ -0,0 +1,144 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from .season import newSeasonState, getRoundCount, updateResultsTable, updateQualifyingTable, getResultsTable
+from .standings import computeStandings
+
+# a constructor in position n is expected to finish around 2n - 0.5, pulled towards EXPECTED_MIDDLE
+EXPECTED_MIDDLE = 5
+QUALI_COMPRESSION = 0.7
+RACE_COMPRESSION = 0.5
+
+def getPerformanceMean(values):
+    if len(values) < 4:
+        return sum(values) / len(values)
+    
+    sortedValues = sorted(values)
+    
+    p1 = len(sortedValues) * 0.1
+    p3 = len(sortedValues) * 0.9
+    
+    start = int(math.ceil(p1))
+    end = int(math.floor(p3))
+    
+    middle = sortedValues[start:end + 1]
+    
+    return sum(middle) / len(middle)
+
+def getPerformanceMeans(scores, valueColumn, groupBy=['driverId']):
+    # getPerformanceMean for every group at once, the middle 10-90% of each group's sorted values
+    ranked = scores.sort_values(groupBy + [valueColumn])
+    groups = ranked.groupby(groupBy)
+    count = groups[valueColumn].transform('size')
+    rank = groups.cumcount()
+    
+    start = np.ceil(count * 0.1)
+    end = np.floor(count * 0.9)
+    isMiddle = (count < 4) | ((rank >= start) & (rank <= end))
+    
+    return ranked[isMiddle].groupby(groupBy)[valueColumn].mean()
+
+def getPerformance(expectedPos, actualPos):
+    # finishing ahead of expected is rewarded more than finishing behind it is punished
+    performance = expectedPos - actualPos
+    return np.where(performance < 0, -np.power(np.abs(performance), 1.2) / 3, np.power(np.abs(performance), 1.2) / 1.5)
+
+def getExpectedPosition(constrPos, compression):
+    originalMin = (constrPos * 2) - 1
+    originalMax = constrPos * 2
+    originalAvg = (originalMin + originalMax) / 2
+    return EXPECTED_MIDDLE + (originalAvg - EXPECTED_MIDDLE) * compression
+
+def getSeasonTable(seasonState):
+    # one row per (round, driver) with qualifying and race positions and each team's constructor standing
+    resultsTable = getResultsTable(seasonState)
+    raceTable = resultsTable[resultsTable['session'] == 'race']
+    qualiTable = pd.DataFrame(seasonState['qualifyingTable'], columns=['round', 'driverId', 'constructorId', 'position'])
+    roundsTable = pd.DataFrame(seasonState['roundsTable'], columns=['round', 'raceName', 'country'])
+    
+    # a round is only scored once its qualifying and race results are both in
+    scoredRounds = set(seasonState['resultsTableRounds']) & set(seasonState['qualifyingRounds'])
+    raceTable = raceTable[raceTable['round'].isin(scoredRounds)]
+    qualiTable = qualiTable[qualiTable['round'].isin(scoredRounds)]
+    
+    constrStandings = computeStandings(resultsTable, 'constructorId')[['round', 'constructorId', 'position']]
+    
+    qualiTable = qualiTable.rename(columns={'constructorId': 'qualiConstructorId', 'position': 'qualiPos'})
+    qualiTable = qualiTable.merge(constrStandings.rename(columns={'constructorId': 'qualiConstructorId', 'position': 'qualiConstrPos'}), how='left')
+    raceTable = raceTable[['round', 'driverId', 'constructorId', 'position', 'positionText']]
+    raceTable = raceTable.rename(columns={'constructorId': 'raceConstructorId', 'position': 'raceOrder', 'positionText': 'racePositionText'})
+    raceTable = raceTable.merge(constrStandings.rename(columns={'constructorId': 'raceConstructorId', 'position': 'raceConstrPos'}), how='left')
+    
+    seasonTable = qualiTable.merge(raceTable, on=['round', 'driverId'], how='outer')
+    seasonTable = seasonTable.merge(roundsTable, on='round', how='left')
+    seasonTable = seasonTable.sort_values(['round', 'raceOrder', 'qualiPos']).reset_index(drop=True)
+    
+    # drivers who retired or were disqualified are placed at the back of the qualifying order
+    qualiCounts = qualiTable.groupby('round').size()
+    isClassified = seasonTable['racePositionText'].fillna('').str.isdigit()
+    lastPosition = seasonTable['round'].map(qualiCounts).fillna(0).astype(int).astype(str)
+    racePosition = seasonTable['racePositionText'].where(isClassified, lastPosition)
+    seasonTable['racePos'] = racePosition.where(seasonTable['raceOrder'].notna())
+    return seasonTable
+
+def getRoundScores(seasonTable):
+    # the season table's rows with a qualifying and with a race performance, keeping the table's index
+    qualiRows = seasonTable[seasonTable['qualiPos'].notna() & seasonTable['qualiConstrPos'].notna()]
+    qualiExpected = getExpectedPosition(qualiRows['qualiConstrPos'], QUALI_COMPRESSION)
+    qualiScores = qualiRows.assign(performance=getPerformance(qualiExpected, qualiRows['qualiPos']))
+    
+    raceRows = seasonTable[seasonTable['racePos'].notna() & seasonTable['raceConstrPos'].notna()]
+    raceExpected = getExpectedPosition(raceRows['raceConstrPos'], RACE_COMPRESSION)
+    raceScores = raceRows.assign(racePacePerformance=getPerformance(raceExpected, raceRows['racePos'].astype(int)))
+    
+    return qualiScores, raceScores
+
+def scoreSeasonTable(seasonTable, groupBy=['driverId']):
+    qualiScores, raceScores = getRoundScores(seasonTable)
+    
+    return pd.DataFrame({
+        'avgQualifyingPerformance': getPerformanceMeans(qualiScores, 'performance', groupBy),
+        'avgRacePace': getPerformanceMeans(raceScores, 'racePacePerformance', groupBy)
+    })
+
+def getAllRaceResults(seasonTable):
+    raceRows = seasonTable[seasonTable['raceOrder'].notna()].copy()
+    qualiRows = seasonTable[seasonTable['qualiPos'].notna()].sort_values(['round', 'qualiPos'])
+    lastQualiPos = qualiRows.groupby('round')['qualiPos'].last()
+    
+    # a driver with no qualifying result carries over the qualifying position of the driver classified ahead of them
+    qualiPosition = raceRows['qualiPos'].map(lambda pos: str(int(pos)), na_action='ignore')
+    qualiPosition = qualiPosition.groupby(raceRows['round']).ffill()
+    raceRows['qualiPosition'] = qualiPosition.astype(object).where(qualiPosition.notna(), raceRows['round'].map(lastQualiPos).astype(int))
+    
+    allRaceResults = {}
+    for driverId, country, racePosition, qualiPosition, roundNum in raceRows[['driverId', 'country', 'racePos', 'qualiPosition', 'round']].itertuples(index=False):
+        if driverId not in allRaceResults:
+            allRaceResults[driverId] = []
+        allRaceResults[driverId].append({
+            'country': country,
+            'racePosition': racePosition,
+            'qualiPosition': qualiPosition,
+            'round': int(roundNum)
+        })
+    return allRaceResults
+
+def getSeasonResults(year, rounds=None, seasonState=None, maxAge=None):
+    if seasonState is None:
+        seasonState = newSeasonState(year)
+    if rounds is None:
+        rounds = range(1, getRoundCount(year) + 1)
+    
+    updateResultsTable(rounds, seasonState, maxAge)
+    updateQualifyingTable(rounds, seasonState, maxAge)
+    return scoreSeason(seasonState)
+
+def scoreSeason(seasonState):
+    seasonTable = getSeasonTable(seasonState)
+    
+    driverSkills = scoreSeasonTable(seasonTable).fillna(0).round(2)
+    driverSkillsAvgs = {driverId: {key: float(value) for key, value in skills.items()} for driverId, skills in driverSkills.to_dict('index').items()}
+    
+    return driverSkillsAvgs, getAllRaceResults(seasonTable)
@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from .fetch import fetchJson, fetchAllJson, fetchAllPages, JOLPICA_URL
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SEASON = 2025
+# results/qualifying tables and processed rounds, so --incremental only has to fetch new rounds
+STATE_FILE = 'drivers-{year}.state.json'
+STATE_VERSION = 3
+
+def newSeasonState(year):
+    return {
+        'version': STATE_VERSION,
+        'season': year,
+        'resultsTableRounds': [],
+        'resultsTable': [],
+        'roundsTable': [],
+        'qualifyingRounds': [],
+        'qualifyingTable': [],
+        # {constructorId: {'name', 'nationality', 'url'}} of every team in the results and qualifying
+        'constructors': {},
+        'allStandings': {}
+    }
+
+def loadSeasonState(year):
+    try:
+        with open(STATE_FILE.format(year=year)) as f:
+            seasonState = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    # state saved by an older version of the script can't be extended, rebuild from scratch
+    if seasonState.get('version') != STATE_VERSION:
+        return None
+    return seasonState
+
+def saveSeasonState(seasonState):
+    statePath = STATE_FILE.format(year=seasonState['season'])
+    tmpPath = statePath + '.tmp'
+    with open(tmpPath, 'w') as f:
+        json.dump(seasonState, f)
+    os.replace(tmpPath, statePath)
+
+def getRoundCount(year):
+    url = f"{JOLPICA_URL}/{year}/races/?format=json&limit=100"
+    data = fetchJson(url)
+    return int(data['MRData']['total'])
+
+def getRaceStartTimes(year):
+    url = f"{JOLPICA_URL}/{year}/races/?format=json&limit=100"
+    data = fetchJson(url)
+    
+    # older seasons have no start time, those races count as starting at midnight UTC
+    startTimes = {}
+    for race in data['MRData']['RaceTable']['Races']:
+        startTime = datetime.fromisoformat(f"{race['date']}T{race.get('time', '00:00:00Z').replace('Z', '')}")
+        startTimes[int(race['round'])] = startTime.replace(tzinfo=timezone.utc)
+    return startTimes
+
+def getCircuits(year):
+    url = f"{JOLPICA_URL}/{year}/races/?format=json&limit=100"
+    data = fetchJson(url)
+    return {int(race['round']): race['Circuit']['circuitId'] for race in data['MRData']['RaceTable']['Races']}
+
+def getLatestRace(year, maxAge=None):
+    url = f"{JOLPICA_URL}/{year}/last/races/?format=json"
+    data = fetchJson(url, maxAge=maxAge)
+    return data['MRData']['RaceTable']['Races'][0]
+
+def getLatestRound(year, maxAge=None):
+    return int(getLatestRace(year, maxAge)['round'])
+
+def getProcessedRounds(seasonState):
+    # rounds whose results and qualifying are both in the state
+    if seasonState is None:
+        return set()
+    return set(seasonState['resultsTableRounds']) & set(seasonState['qualifyingRounds'])
+
+def dropRounds(seasonState, rounds):
+    # takes rounds back out of the state, so the next incremental build fetches them again
+    rounds = set(rounds)
+    for key in ['resultsTableRounds', 'qualifyingRounds']:
+        seasonState[key] = [roundNum for roundNum in seasonState[key] if roundNum not in rounds]
+    for key in ['resultsTable', 'roundsTable', 'qualifyingTable']:
+        seasonState[key] = [row for row in seasonState[key] if row['round'] not in rounds]
+    return seasonState
+
+def addConstructors(seasonState, results):
+    # a field missing from one response doesn't erase what another one had
+    for result in results:
+        constructor = result['Constructor']
+        details = seasonState['constructors'].setdefault(constructor['constructorId'], {'name': None, 'nationality': None, 'url': None})
+        details.update({key: constructor[key] for key in details if constructor.get(key) is not None})
+
+def getResultRows(roundNum, session, results):
+    rows = []
+    for result in results:
+        rows.append({
+            'round': roundNum,
+            'session': session,
+            'driverId': result['Driver']['driverId'],
+            'constructorId': result['Constructor']['constructorId'],
+            'position': int(result['position']),
+            'positionText': result['positionText'],
+            'points': float(result['points'])
+        })
+    return rows
+
+def raiseFailedRounds(dataName, failedRounds):
+    # a round that couldn't be fetched fails the build, rather than quietly leaving the round out of the scores
+    if not failedRounds:
+        return
+    
+    for roundNum, e in failedRounds.items():
+        log.warning(f"Could not fetch {dataName} for round {roundNum}: {e}")
+    raise RuntimeError(f"Could not fetch {dataName} for rounds {sorted(failedRounds)}")
+
+def updateResultsTable(rounds, seasonState, maxAge=None):
+    year = seasonState['season']
+    missingRounds = [roundNum for roundNum in rounds if roundNum not in seasonState['resultsTableRounds']]
+    if not missingRounds:
+        return
+    
+    log.info(f"Fetching race results for {len(missingRounds)} rounds")
+    urls = [f"{JOLPICA_URL}/{year}/{roundNum}/results/?format=json" for roundNum in missingRounds]
+    responses = fetchAllJson(urls, maxAge)
+    
+    failedRounds = {}
+    for roundNum, data in zip(missingRounds, responses):
+        try:
+            if isinstance(data, Exception):
+                raise data
+            
+            if 'RaceTable' not in data['MRData'] or not data['MRData']['RaceTable']['Races']:
+                log.debug(f"No race results for round {roundNum}")
+                continue
+            
+            raceInfo = data['MRData']['RaceTable']['Races'][0]
+            seasonState['resultsTable'].extend(getResultRows(roundNum, 'race', raceInfo['Results']))
+            addConstructors(seasonState, raceInfo['Results'])
+            seasonState['roundsTable'].append({
+                'round': roundNum,
+                'raceName': raceInfo['raceName'],
+                'country': raceInfo['Circuit']['Location']['country']
+            })
+            seasonState['resultsTableRounds'].append(roundNum)
+        
+        except Exception as e:
+            failedRounds[roundNum] = e
+    
+    raiseFailedRounds('race results', failedRounds)
+    
+    # sprint points count towards the championship too, one season-wide query covers every sprint
+    sprintRaces = fetchAllPages(f"{JOLPICA_URL}/{year}/sprint/?format=json", 'SprintResults', maxAge=maxAge)
+    
+    rows = [row for row in seasonState['resultsTable'] if row['session'] != 'sprint']
+    for race in sprintRaces:
+        rows.extend(getResultRows(int(race['round']), 'sprint', race['SprintResults']))
+        addConstructors(seasonState, race['SprintResults'])
+    seasonState['resultsTable'] = rows
+
+def getResultsTable(seasonState):
+    resultsTable = pd.DataFrame(seasonState['resultsTable'], columns=['round', 'session', 'driverId', 'constructorId', 'position', 'positionText', 'points'])
+    return resultsTable[resultsTable['round'].isin(seasonState['resultsTableRounds'])]
+
+def updateSeasonState(standingsRounds, resultsRounds, seasonState, maxAge=None):
+    # everything the standings and scores are computed from, the rounds in standingsRounds only need race results
+    updateResultsTable(sorted(set(standingsRounds) | set(resultsRounds)), seasonState, maxAge)
+    updateQualifyingTable(resultsRounds, seasonState, maxAge)
+    return seasonState
+
+def updateQualifyingTable(rounds, seasonState, maxAge=None):
+    year = seasonState['season']
+    missingRounds = [roundNum for roundNum in rounds if roundNum not in seasonState['qualifyingRounds']]
+    if not missingRounds:
+        return
+    
+    log.info(f"Fetching qualifying data for {len(missingRounds)} rounds")
+    urls = [f"{JOLPICA_URL}/{year}/{roundNum}/qualifying/?format=json" for roundNum in missingRounds]
+    responses = fetchAllJson(urls, maxAge)
+    
+    failedRounds = {}
+    for roundNum, data in zip(missingRounds, responses):
+        try:
+            if isinstance(data, Exception):
+                raise data
+            
+            if 'RaceTable' not in data['MRData'] or not data['MRData']['RaceTable']['Races']:
+                log.debug(f"No qualifying data for round {roundNum}")
+                continue
+            
+            qualifyingResults = data['MRData']['RaceTable']['Races'][0]['QualifyingResults']
+            addConstructors(seasonState, qualifyingResults)
+            for result in qualifyingResults:
+                seasonState['qualifyingTable'].append({
+                    'round': roundNum,
+                    'driverId': result['Driver']['driverId'],
+                    'constructorId': result['Constructor']['constructorId'],
+                    'position': int(result['position'])
+                })
+            seasonState['qualifyingRounds'].append(roundNum)
+        
+        except Exception as e:
+            failedRounds[roundNum] = e
+    
+    raiseFailedRounds('qualifying', failedRounds)
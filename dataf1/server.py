@@ -0,0 +1,301 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+from .headtohead import MATRIX_NAMES
+from .output import OUTPUT_DIR
+
+log = logging.getLogger(__name__)
+
+# the output directory is checked for a new build at most once every RELOAD_CHECK_INTERVAL seconds
+RELOAD_CHECK_INTERVAL = 1.0
+# responses smaller than this aren't worth compressing
+MIN_GZIP_BYTES = 512
+# serialized responses kept per build, so odd query strings can't grow the cache forever
+MAX_CACHED_RESPONSES = 10000
+
+# GET (and HEAD) endpoints, a driver can be given by driverId or code:
+#   /drivers                        every driver with their career stats and scores
+#   /drivers/<driver>               one driver with their standings and results after every round
+#   /h2h/<driver>/<driver>          two drivers side by side in every round they both raced
+#   /standings[?round=N]            drivers' standings after round N, the latest round by default
+#   /rounds/<round>                 every driver's result in one round
+#   /constructors/<constructorId>   a team's drivers and their results
+
+def readShardRows(columns):
+    # shards store one array per column, the server works with one dict per round
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+class SeasonData:
+    def __init__(self, outputDir):
+        with open(os.path.join(outputDir, 'index.json')) as f:
+            self.drivers = {driver['driverId']: driver for driver in json.load(f)}
+        
+        self.driverIds = {}
+        self.standings = {}
+        self.results = {}
+        self.standingsByRound = {}
+        self.resultsByRound = {}
+        self.driversByConstructor = {}
+        
+        for driverId, driver in self.drivers.items():
+            self.driverIds[driverId] = driverId
+            self.driverIds[driver['code']] = driverId
+            
+            with open(os.path.join(outputDir, f"{driverId}.json")) as f:
+                shard = json.load(f)
+            self.standings[driverId] = readShardRows(shard['standings'])
+            self.results[driverId] = readShardRows(shard['results'])
+            
+            for row in self.standings[driverId]:
+                self.standingsByRound.setdefault(row['round'], []).append(dict(row, driverId=driverId, code=driver['code']))
+            for row in self.results[driverId]:
+                self.resultsByRound.setdefault(row['round'], []).append(dict(row, driverId=driverId, code=driver['code']))
+                if row.get('constructorId'):
+                    self.driversByConstructor.setdefault(row['constructorId'], set()).add(driverId)
+        
+        for rows in self.standingsByRound.values():
+            rows.sort(key=lambda row: row['position'])
+        for rows in self.resultsByRound.values():
+            rows.sort(key=lambda row: row['racePosition'])
+        
+        self.latestRound = max(self.standingsByRound, default=None)
+        
+        # the precomputed head-to-head matrices, builds from before they were written don't have them
+        self.headToHead = None
+        self.headToHeadIndex = {}
+        h2hPath = os.path.join(outputDir, 'h2h.json')
+        if os.path.exists(h2hPath):
+            with open(h2hPath) as f:
+                self.headToHead = json.load(f)
+            self.headToHeadIndex = {driverId: index for index, driverId in enumerate(self.headToHead['driverIds'])}
+    
+    def getDriver(self, driverKey):
+        driverId = self.driverIds.get(driverKey)
+        if driverId is None:
+            return None
+        return {'driver': self.drivers[driverId], 'standings': self.standings[driverId], 'results': self.results[driverId]}
+    
+    def getHeadToHead(self, firstKey, secondKey):
+        firstId = self.driverIds.get(firstKey)
+        secondId = self.driverIds.get(secondKey)
+        if firstId is None or secondId is None:
+            return None
+        
+        secondResults = {row['round']: row for row in self.results[secondId]}
+        rounds = []
+        summary = {firstId: {'qualifying': 0, 'race': 0}, secondId: {'qualifying': 0, 'race': 0}}
+        for first in self.results[firstId]:
+            second = secondResults.get(first['round'])
+            if second is None:
+                continue
+            
+            rounds.append({'round': first['round'], 'country': first['country'], firstId: first, secondId: second})
+            for session, column in [('qualifying', 'qualiPosition'), ('race', 'racePosition')]:
+                if first[column] != second[column]:
+                    summary[firstId if first[column] < second[column] else secondId][session] += 1
+        
+        headToHead = {
+            'drivers': [self.drivers[firstId], self.drivers[secondId]],
+            'ahead': summary,
+            'rounds': rounds
+        }
+        if firstId in self.headToHeadIndex and secondId in self.headToHeadIndex:
+            headToHead['matrix'] = self.getMatrixEntries(self.headToHeadIndex[firstId], self.headToHeadIndex[secondId])
+        return headToHead
+    
+    def getMatrixEntries(self, first, second):
+        # the first driver's record against the second, pointsDelta has one entry per round in 'rounds'
+        entries = {'rounds': self.headToHead['rounds']}
+        for name in MATRIX_NAMES:
+            if name in self.headToHead:
+                entries[name] = self.headToHead[name][first][second]
+        if 'roundPoints' in self.headToHead:
+            entries['pointsDelta'] = [round(points[first] - points[second], 2) for points in self.headToHead['roundPoints']]
+        return entries
+    
+    def getStandings(self, roundNum):
+        if roundNum is None:
+            roundNum = self.latestRound
+        if roundNum not in self.standingsByRound:
+            return None
+        return {'round': roundNum, 'standings': self.standingsByRound[roundNum]}
+    
+    def getRound(self, roundNum):
+        if roundNum not in self.resultsByRound:
+            return None
+        return {'round': roundNum, 'results': self.resultsByRound[roundNum]}
+    
+    def getConstructor(self, constructorId):
+        if constructorId not in self.driversByConstructor:
+            return None
+        driverIds = sorted(self.driversByConstructor[constructorId])
+        return {
+            'constructorId': constructorId,
+            'drivers': [self.drivers[driverId] for driverId in driverIds],
+            'results': [row for roundNum in sorted(self.resultsByRound) for row in self.resultsByRound[roundNum] if row.get('constructorId') == constructorId]
+        }
+
+def getRoundParam(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def route(seasonData, path, query):
+    parts = [part for part in path.split('/') if part]
+    if parts == ['drivers']:
+        return list(seasonData.drivers.values())
+    if len(parts) == 2 and parts[0] == 'drivers':
+        return seasonData.getDriver(parts[1])
+    if len(parts) == 3 and parts[0] == 'h2h':
+        return seasonData.getHeadToHead(parts[1], parts[2])
+    if parts == ['standings']:
+        if 'round' not in query:
+            return seasonData.getStandings(None)
+        roundNum = getRoundParam(query['round'])
+        return seasonData.getStandings(roundNum) if roundNum is not None else None
+    if len(parts) == 2 and parts[0] == 'rounds':
+        return seasonData.getRound(getRoundParam(parts[1]))
+    if len(parts) == 2 and parts[0] == 'constructors':
+        return seasonData.getConstructor(parts[1])
+    return None
+
+class SeasonStore:
+    # the loaded season and its serialized responses, swapped out as a whole when a new build lands
+    def __init__(self, year):
+        self.outputDir = OUTPUT_DIR.format(year=year)
+        self.indexPath = os.path.join(self.outputDir, 'index.json')
+        self.lock = threading.Lock()
+        self.indexMtime = None
+        self.nextCheck = 0.0
+        # the data and its serialized responses are swapped together, so a response never outlives its data
+        self.current = (None, {})
+        # the server can be started before the first build, it answers 503 until one is written
+        if not os.path.exists(self.indexPath):
+            log.error(f"No build in {self.outputDir} yet, serving 503 until one is written")
+        self.checkForReload()
+    
+    def isLoaded(self):
+        self.checkForReload()
+        return self.current[0] is not None
+    
+    def reload(self):
+        indexMtime = os.stat(self.indexPath).st_mtime_ns
+        if indexMtime == self.indexMtime:
+            return
+        
+        seasonData = SeasonData(self.outputDir)
+        self.current = (seasonData, {})
+        self.indexMtime = indexMtime
+        log.info(f"Loaded {len(seasonData.drivers)} drivers up to round {seasonData.latestRound} from {self.outputDir}")
+    
+    def checkForReload(self):
+        now = time.monotonic()
+        if now < self.nextCheck:
+            return
+        
+        with self.lock:
+            if now < self.nextCheck:
+                return
+            self.nextCheck = now + RELOAD_CHECK_INTERVAL
+            if not os.path.exists(self.indexPath):
+                return
+            try:
+                self.reload()
+            except (OSError, ValueError, KeyError) as e:
+                # a build that's still being written, the current data is served until the next check
+                log.warning(f"Could not reload {self.outputDir}: {e}")
+    
+    def getResponse(self, target):
+        self.checkForReload()
+        seasonData, responses = self.current
+        if target in responses:
+            return responses[target]
+        
+        parts = urlsplit(target)
+        data = route(seasonData, parts.path, dict(parse_qsl(parts.query)))
+        if data is None:
+            return None
+        
+        body = json.dumps(data, separators=(',', ':')).encode()
+        response = {
+            'body': body,
+            'gzipBody': gzip.compress(body, compresslevel=6) if len(body) >= MIN_GZIP_BYTES else None,
+            'etag': '"' + hashlib.sha1(body).hexdigest() + '"'
+        }
+        if len(responses) < MAX_CACHED_RESPONSES:
+            responses[target] = response
+        return response
+
+def getRequestHandler(store):
+    class RequestHandler(BaseHTTPRequestHandler):
+        # keep-alive, so a client can send many requests over one connection, and no Nagle delay
+        # between the headers and the body of a small response
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+        
+        def do_GET(self):
+            self.respond(includeBody=True)
+        
+        def do_HEAD(self):
+            # the same status and headers as a GET, without the body
+            self.respond(includeBody=False)
+        
+        def respond(self, includeBody):
+            if not store.isLoaded():
+                self.sendBody(503, b'{"error":"no build yet"}', includeBody=includeBody)
+                return
+            
+            response = store.getResponse(self.path)
+            if response is None:
+                self.sendBody(404, b'{"error":"not found"}', includeBody=includeBody)
+                return
+            
+            if self.headers.get('If-None-Match') == response['etag']:
+                self.send_response(304)
+                self.send_header('ETag', response['etag'])
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            
+            useGzip = response['gzipBody'] is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+            self.sendBody(200, response['gzipBody'] if useGzip else response['body'], response['etag'], useGzip, includeBody)
+        
+        def sendBody(self, status, body, etag=None, useGzip=False, includeBody=True):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            # the dashboard is opened from a different origin than the server
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Vary', 'Accept-Encoding')
+            if etag:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+            if useGzip:
+                self.send_header('Content-Encoding', 'gzip')
+            self.end_headers()
+            if includeBody:
+                self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            log.debug(f"{self.address_string()} {format % args}")
+    
+    return RequestHandler
+
+def serveSeason(year, host, port):
+    store = SeasonStore(year)
+    server = ThreadingHTTPServer((host, port), getRequestHandler(store))
+    server.daemon_threads = True
+    log.info(f"Serving {store.outputDir} on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
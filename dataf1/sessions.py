@@ -0,0 +1,110 @@
+import functools
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from . import fetch
+from .instrumentation import recordRequest
+from .season import getLatestRace
+
+log = logging.getLogger(__name__)
+
+# shown for drivers missing from the sessions the headshots are read from
+FALLBACK_HEADSHOT_URL = 'https://media.formula1.com/d_driver_fallback_image.png/content/dam/fom-website/drivers/'
+
+# only load sessions from the fastf1 cache, other requests still go out (--fastf1-offline)
+FASTF1_OFFLINE = False
+
+sessionLock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def getFastf1():
+    # fastf1 takes seconds to import, so it's only loaded once a command needs a session
+    import fastf1
+    
+    # fastf1 logs every request it makes at INFO; its logger is left at DEBUG and set_log_level only filters
+    # fastf1's own handler, so its records aren't passed on to the root handler as well
+    fastf1.set_log_level(logging.DEBUG if log.getEffectiveLevel() <= logging.DEBUG else logging.WARNING)
+    logging.getLogger('fastf1').propagate = False
+    
+    fastf1CacheDir = os.path.join(fetch.CACHE_DIR, 'fastf1')
+    os.makedirs(fastf1CacheDir, exist_ok=True)
+    fastf1.Cache.enable_cache(fastf1CacheDir)
+    fastf1.Cache.offline_mode(fetch.OFFLINE or FASTF1_OFFLINE)
+    return fastf1
+
+def getSessionResults(year, event, sessionName):
+    # one session loads at a time, so stages running in parallel that need the same session share one load
+    with sessionLock:
+        return loadSessionResults(year, event, sessionName)
+
+@functools.lru_cache(maxsize=None)
+def loadSessionResults(year, event, sessionName):
+    # results and driver info only, no laps, telemetry, weather or race control messages
+    start = time.perf_counter()
+    try:
+        session = getFastf1().get_session(year, event, sessionName)
+        session.load(laps=False, telemetry=False, weather=False, messages=False)
+    except Exception:
+        recordRequest(f"fastf1 {sessionName} session", requests=1, errors=1, seconds=time.perf_counter() - start)
+        raise
+    recordRequest(f"fastf1 {sessionName} session", requests=1, seconds=time.perf_counter() - start)
+    return session.results
+
+def getSessionLaps(year, event, sessionName='R'):
+    # laps and weather, still no telemetry; not cached, the caller keeps a session only as long as it needs it
+    with sessionLock:
+        start = time.perf_counter()
+        try:
+            session = getFastf1().get_session(year, event, sessionName)
+            session.load(laps=True, telemetry=False, weather=True, messages=False)
+            laps, weather = session.laps, session.weather_data
+        except Exception:
+            recordRequest(f"fastf1 {sessionName} laps session", requests=1, errors=1, seconds=time.perf_counter() - start)
+            raise
+        recordRequest(f"fastf1 {sessionName} laps session", requests=1, seconds=time.perf_counter() - start)
+        return laps, weather
+
+def getHeadshots(year, codes):
+    # the latest race has the current line-up, the first race covers drivers who have since been replaced
+    headshots = {}
+    for event in [getLatestRace(year)['raceName'], 1]:
+        if all(code in headshots for code in codes):
+            break
+        
+        try:
+            results = getSessionResults(year, event, 'R')
+        except Exception as e:
+            log.warning(f"Session not available for headshots: {e}")
+            continue
+        
+        for code, headshotUrl in zip(results['Abbreviation'], results['HeadshotUrl']):
+            if code not in headshots:
+                headshots[code] = headshotUrl
+    
+    return pd.DataFrame({
+        'Abbreviation': codes,
+        'HeadshotUrl': [headshots.get(code, FALLBACK_HEADSHOT_URL) for code in codes]
+    })
+
+def getTeams(year):
+    log.info("Getting latest race")
+    # a session that isn't available fails the build, which keeps the previous output, rather than
+    # writing every driver's team as 'Unknown'
+    try:
+        results = getSessionResults(year, getLatestRace(year)['raceName'], 'R')
+    except Exception as e:
+        raise RuntimeError(f"Latest round not available for the teams: {e}") from e
+    
+    teams = {}
+    
+    for driverAbb, teamName, teamColour in zip(results['Abbreviation'], results['TeamName'], results['TeamColor']):
+        teams[driverAbb] = {
+            'teamName': teamName,
+            'teamColour': teamColour
+        }
+    
+    return teams
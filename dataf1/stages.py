@@ -0,0 +1,104 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from . import fetch
+from .instrumentation import timeStage, recordReusedStage
+
+log = logging.getLogger(__name__)
+
+# a stage is a dict of
+#   'deps'      names of the stages whose results it's called with
+#   'run'       function of those results
+#   'key'       function of the same results giving everything else the result depends on, a stage
+#               without one runs every time
+#   'complete'  optional check of the result, an incomplete one (a failed fetch) isn't kept
+# results are pickled under CACHE_DIR/STAGE_CACHE_DIR, keyed by the key and the package's code,
+# only the latest result of each stage and season is kept
+STAGE_CACHE_DIR = 'stages'
+MAX_PARALLEL_STAGES = 4
+
+@functools.lru_cache(maxsize=None)
+def getCodeVersion():
+    # any change to the package's code invalidates every stored stage result
+    packageDir = os.path.dirname(os.path.abspath(__file__))
+    codeHash = hashlib.sha256()
+    for name in sorted(os.listdir(packageDir)):
+        if name.endswith('.py'):
+            with open(os.path.join(packageDir, name), 'rb') as f:
+                codeHash.update(f.read())
+    return codeHash.hexdigest()
+
+def getStagePrefix(year, name):
+    return f"{year}-{name.replace(' ', '-')}-"
+
+def getStagePath(year, name, keyValues):
+    # pickles of equal values can differ with how the objects in them are shared, JSON doesn't
+    keyHash = hashlib.sha256(getCodeVersion().encode())
+    keyHash.update(json.dumps([year, name, keyValues], sort_keys=True, default=repr).encode())
+    return os.path.join(fetch.CACHE_DIR, STAGE_CACHE_DIR, getStagePrefix(year, name) + keyHash.hexdigest()[:32] + '.pkl')
+
+def loadStageResult(path):
+    # (found, result), so a stage whose result is None can still be reused
+    try:
+        with open(path, 'rb') as f:
+            return True, pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return False, None
+
+def saveStageResult(year, name, path, result):
+    stageDir = os.path.dirname(path)
+    os.makedirs(stageDir, exist_ok=True)
+    tmpPath = f"{path}.{os.getpid()}.tmp"
+    with open(tmpPath, 'wb') as f:
+        pickle.dump(result, f, protocol=4)
+    os.replace(tmpPath, path)
+    
+    prefix = getStagePrefix(year, name)
+    for fileName in os.listdir(stageDir):
+        stalePath = os.path.join(stageDir, fileName)
+        if fileName.startswith(prefix) and fileName.endswith('.pkl') and stalePath != path:
+            os.remove(stalePath)
+
+def runStage(year, name, stage, results):
+    depResults = [results[dep] for dep in stage['deps']]
+    with timeStage(name):
+        if stage.get('key') is None:
+            return stage['run'](*depResults)
+        
+        path = getStagePath(year, name, stage['key'](*depResults))
+        found, result = loadStageResult(path)
+        if found:
+            log.info(f"Reusing {name} from an earlier run")
+            recordReusedStage(name)
+            return result
+        
+        result = stage['run'](*depResults)
+        if stage.get('complete', lambda result: True)(result):
+            saveStageResult(year, name, path, result)
+        return result
+
+def runStages(year, stages):
+    # every stage starts as soon as all of its dependencies are done, so independent ones run in parallel
+    results = {}
+    pending = dict(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_STAGES) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage['deps']):
+                    running[executor.submit(runStage, year, name, stage, results)] = name
+                    del pending[name]
+            
+            if not running:
+                raise ValueError(f"Stages {sorted(pending)} depend on stages that don't exist")
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    
+    return results
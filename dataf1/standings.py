@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from .season import newSeasonState, getRoundCount, updateResultsTable, getResultsTable
+
+def computeStandings(resultsTable, key):
+    # cumulative standings after every round for key ('driverId' or 'constructorId')
+    if resultsTable.empty:
+        return pd.DataFrame(columns=['round', key, 'position', 'points'])
+    
+    rounds = np.sort(resultsTable['round'].unique())
+    entrants = np.sort(resultsTable[key].unique())
+    roundIndex = np.searchsorted(rounds, resultsTable['round'].to_numpy())
+    entrantIndex = np.searchsorted(entrants, resultsTable[key].to_numpy())
+    shape = (len(rounds), len(entrants))
+    
+    points = np.zeros(shape)
+    np.add.at(points, (roundIndex, entrantIndex), resultsTable['points'].to_numpy())
+    points = points.cumsum(axis=0)
+    
+    started = np.zeros(shape, dtype=bool)
+    started[roundIndex, entrantIndex] = True
+    started = np.logical_or.accumulate(started, axis=0)
+    
+    # ties on points go to most wins, then most second places and so on, only classified grand prix finishes count
+    isCountback = ((resultsTable['session'] == 'race') & resultsTable['positionText'].str.isdigit()).to_numpy()
+    positions = resultsTable['position'].to_numpy()
+    maxPosition = positions.max()
+    finishes = np.zeros(shape + (maxPosition,))
+    np.add.at(finishes, (roundIndex[isCountback], entrantIndex[isCountback], positions[isCountback] - 1), 1)
+    finishes = finishes.cumsum(axis=0)
+    
+    # one sort over every (round, entrant) pair, np.lexsort sorts by its last key first
+    roundKey = np.broadcast_to(np.arange(len(rounds))[:, None], shape)
+    keys = [-finishes[:, :, position] for position in reversed(range(maxPosition))]
+    keys += [-points, ~started, roundKey]
+    order = np.lexsort([k.ravel() for k in keys])
+    
+    standingPositions = np.empty(order.size, dtype=int)
+    standingPositions[order] = np.arange(order.size) % len(entrants) + 1
+    
+    standings = pd.DataFrame({
+        'round': np.repeat(rounds, len(entrants)),
+        key: np.tile(entrants, len(rounds)),
+        'position': standingPositions,
+        'points': points.ravel()
+    })
+    return standings[started.ravel()].reset_index(drop=True)
+
+def getDriverStandings(year, rounds=None, seasonState=None, maxAge=None):
+    if seasonState is None:
+        seasonState = newSeasonState(year)
+    if rounds is None:
+        rounds = range(1, getRoundCount(year) + 1)
+    
+    updateResultsTable(rounds, seasonState, maxAge)
+    seasonState['allStandings'] = getAllStandings(seasonState)
+    return seasonState['allStandings']
+
+def getAllStandings(seasonState):
+    # 'round&position&points' after every round for every driver
+    standings = computeStandings(getResultsTable(seasonState), 'driverId')
+    
+    allStandings = {}
+    for roundNum, driverId, position, points in standings.itertuples(index=False):
+        if driverId not in allStandings:
+            allStandings[driverId] = []
+        allStandings[driverId].append(f"{roundNum}&{position}&{points:g}")
+    return allStandings
@@ -0,0 +1,194 @@
+import logging
+import math
+import os
+import sqlite3
+import urllib.parse
+
+from .scoring import EXPECTED_MIDDLE, QUALI_COMPRESSION, RACE_COMPRESSION
+from .season import getResultsTable
+from .standings import computeStandings
+
+log = logging.getLogger(__name__)
+
+# every built season, normalized, so new analyses and rescoring run locally without any requests;
+# a build replaces its season's rows as a whole
+STORE_PATH = 'dataf1.sqlite'
+# kept in the store's user_version, a store from another version has its tables dropped and is filled again by builds
+STORE_VERSION = 3
+
+# the primary keys of the per-round tables start with (season, round), which indexes them by round,
+# the driverId indexes are for queries across seasons
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS drivers (
+    driverId TEXT PRIMARY KEY, code TEXT, firstName TEXT, lastName TEXT, dateOfBirth TEXT, nationality TEXT, url TEXT
+);
+CREATE TABLE IF NOT EXISTS careerStats (
+    driverId TEXT PRIMARY KEY, championships INTEGER, wins INTEGER, podiums INTEGER, points REAL, entries INTEGER
+);
+CREATE TABLE IF NOT EXISTS constructors (
+    constructorId TEXT PRIMARY KEY, name TEXT, nationality TEXT, url TEXT
+);
+CREATE TABLE IF NOT EXISTS seasonDrivers (
+    season INTEGER, driverId TEXT, driverNumber TEXT, constructorId TEXT, teamName TEXT, teamColour TEXT,
+    PRIMARY KEY (season, driverId)
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    season INTEGER, round INTEGER, raceName TEXT, country TEXT, hasQualifying INTEGER,
+    PRIMARY KEY (season, round)
+);
+CREATE TABLE IF NOT EXISTS results (
+    season INTEGER, round INTEGER, session TEXT, driverId TEXT, constructorId TEXT, position INTEGER, positionText TEXT, points REAL,
+    PRIMARY KEY (season, round, session, driverId)
+);
+CREATE TABLE IF NOT EXISTS qualifying (
+    season INTEGER, round INTEGER, driverId TEXT, constructorId TEXT, position INTEGER,
+    PRIMARY KEY (season, round, driverId)
+);
+CREATE TABLE IF NOT EXISTS driverStandings (
+    season INTEGER, round INTEGER, driverId TEXT, position INTEGER, points REAL,
+    PRIMARY KEY (season, round, driverId)
+);
+CREATE TABLE IF NOT EXISTS constructorStandings (
+    season INTEGER, round INTEGER, constructorId TEXT, position INTEGER, points REAL,
+    PRIMARY KEY (season, round, constructorId)
+);
+CREATE INDEX IF NOT EXISTS seasonDriversByDriver ON seasonDrivers (driverId);
+CREATE INDEX IF NOT EXISTS resultsByDriver ON results (driverId);
+CREATE INDEX IF NOT EXISTS qualifyingByDriver ON qualifying (driverId);
+CREATE INDEX IF NOT EXISTS driverStandingsByDriver ON driverStandings (driverId);
+"""
+SEASON_TABLES = ['seasonDrivers', 'rounds', 'results', 'qualifying', 'driverStandings', 'constructorStandings']
+# drivers, careerStats and constructors are shared by every season, a build only replaces its own rows
+ALL_TABLES = ['drivers', 'careerStats', 'constructors'] + SEASON_TABLES
+
+# scoreSeason (scoring.py) as one query: each qualifying and race result against the position expected from
+# the team's constructor standing, then every driver's mean over the middle 10-90% of their results
+SCORE_QUERY = """
+WITH scoredRounds AS (
+    SELECT round FROM rounds WHERE season = :season AND hasQualifying
+),
+qualiCounts AS (
+    SELECT round, COUNT(*) AS entrants FROM qualifying JOIN scoredRounds USING (round) WHERE season = :season GROUP BY round
+),
+expectedPositions AS (
+    SELECT 'qualifying' AS session, q.driverId, q.position AS actual,
+        :middle + (2 * cs.position - 0.5 - :middle) * :qualiCompression AS expected
+    FROM qualifying q
+    JOIN scoredRounds USING (round)
+    JOIN constructorStandings cs ON cs.season = q.season AND cs.round = q.round AND cs.constructorId = q.constructorId
+    WHERE q.season = :season
+    UNION ALL
+    -- drivers who retired or were disqualified are placed at the back of the qualifying order
+    SELECT 'race', r.driverId,
+        CASE WHEN r.positionText <> '' AND r.positionText NOT GLOB '*[^0-9]*' THEN CAST(r.positionText AS INTEGER) ELSE COALESCE(qc.entrants, 0) END,
+        :middle + (2 * cs.position - 0.5 - :middle) * :raceCompression
+    FROM results r
+    JOIN scoredRounds USING (round)
+    LEFT JOIN qualiCounts qc ON qc.round = r.round
+    JOIN constructorStandings cs ON cs.season = r.season AND cs.round = r.round AND cs.constructorId = r.constructorId
+    WHERE r.season = :season AND r.session = 'race'
+),
+performances AS (
+    SELECT session, driverId,
+        CASE WHEN expected < actual THEN -power(actual - expected, 1.2) / 3 ELSE power(expected - actual, 1.2) / 1.5 END AS performance
+    FROM expectedPositions
+),
+ranked AS (
+    SELECT session, driverId, performance,
+        ROW_NUMBER() OVER (PARTITION BY session, driverId ORDER BY performance) - 1 AS rank,
+        COUNT(*) OVER (PARTITION BY session, driverId) AS count
+    FROM performances
+)
+SELECT driverId,
+    AVG(CASE WHEN session = 'qualifying' THEN performance END),
+    AVG(CASE WHEN session = 'race' THEN performance END)
+FROM ranked
+WHERE count < 4 OR (rank >= ceil(count * 0.1) AND rank <= floor(count * 0.9))
+GROUP BY driverId
+ORDER BY driverId
+"""
+
+def connect(path=None, readOnly=False):
+    path = path or STORE_PATH
+    if readOnly:
+        connection = openStore(path)
+    else:
+        connection = sqlite3.connect(path, timeout=60)
+        # backfill workers write their seasons to the same store at once
+        connection.execute('PRAGMA journal_mode=WAL')
+        # the version is checked and the tables dropped in one write transaction, so a worker never drops another's rows
+        connection.execute('BEGIN IMMEDIATE')
+        if connection.execute('PRAGMA user_version').fetchone()[0] != STORE_VERSION:
+            for table in ALL_TABLES:
+                connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.execute(f"PRAGMA user_version = {STORE_VERSION}")
+        connection.commit()
+        connection.executescript(SCHEMA)
+    # SQLite only has these built in when it's compiled with its math functions
+    connection.create_function('power', 2, math.pow, deterministic=True)
+    connection.create_function('ceil', 1, math.ceil, deterministic=True)
+    connection.create_function('floor', 1, math.floor, deterministic=True)
+    return connection
+
+def openStore(path):
+    # only a build creates or migrates the store, reading one that's missing or from another version is an
+    # error rather than an empty or wiped store
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {path} yet, build a season first")
+    
+    connection = sqlite3.connect(f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro", uri=True, timeout=60)
+    version = connection.execute('PRAGMA user_version').fetchone()[0]
+    if version != STORE_VERSION:
+        connection.close()
+        raise RuntimeError(f"{path} is store version {version}, this is version {STORE_VERSION}, build the seasons again to rebuild it")
+    return connection
+
+def getRows(table, columns):
+    # plain Python values, with None for missing ones, which is all sqlite3 can bind
+    table = table[columns]
+    return table.astype(object).where(table.notna(), None).itertuples(index=False, name=None)
+
+def writeSeasonStore(seasonState, driversDf):
+    season = seasonState['season']
+    resultsTable = getResultsTable(seasonState)
+    qualifyingRounds = set(seasonState['qualifyingRounds'])
+    driverStandings = computeStandings(resultsTable, 'driverId')
+    constructorStandings = computeStandings(resultsTable, 'constructorId')
+    # the team each driver raced for last, like the team name of the latest race
+    raceResults = resultsTable[resultsTable['session'] == 'race'].sort_values('round')
+    seasonDrivers = driversDf.assign(constructorId=driversDf['driverId'].map(raceResults.groupby('driverId')['constructorId'].last()))
+    
+    connection = connect()
+    try:
+        with connection:
+            for table in SEASON_TABLES:
+                connection.execute(f"DELETE FROM {table} WHERE season = ?", (season,))
+            
+            connection.executemany('INSERT OR REPLACE INTO drivers VALUES (?, ?, ?, ?, ?, ?, ?)', getRows(driversDf, ['driverId', 'code', 'firstName', 'lastName', 'dateOfBirth', 'nationality', 'url']))
+            connection.executemany('INSERT OR REPLACE INTO careerStats VALUES (?, ?, ?, ?, ?, ?)', getRows(driversDf, ['driverId', 'Championships', 'Wins', 'Podiums', 'Points', 'Entries']))
+            connection.executemany('INSERT OR REPLACE INTO constructors VALUES (?, ?, ?, ?)', [
+                (constructorId, constructor['name'], constructor['nationality'], constructor['url']) for constructorId, constructor in seasonState['constructors'].items()
+            ])
+            connection.executemany('INSERT INTO seasonDrivers VALUES (?, ?, ?, ?, ?, ?)', [(season,) + row for row in getRows(seasonDrivers, ['driverId', 'driverNumber', 'constructorId', 'TeamName', 'TeamColour'])])
+            connection.executemany('INSERT INTO rounds VALUES (?, ?, ?, ?, ?)', [
+                (season, row['round'], row['raceName'], row['country'], row['round'] in qualifyingRounds) for row in seasonState['roundsTable']
+            ])
+            connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)', [(season,) + row for row in getRows(resultsTable, ['round', 'session', 'driverId', 'constructorId', 'position', 'positionText', 'points'])])
+            connection.executemany('INSERT OR REPLACE INTO qualifying VALUES (?, ?, ?, ?, ?)', [
+                (season, row['round'], row['driverId'], row['constructorId'], row['position']) for row in seasonState['qualifyingTable']
+            ])
+            connection.executemany('INSERT INTO driverStandings VALUES (?, ?, ?, ?, ?)', [(season,) + row for row in getRows(driverStandings, ['round', 'driverId', 'position', 'points'])])
+            connection.executemany('INSERT INTO constructorStandings VALUES (?, ?, ?, ?, ?)', [(season,) + row for row in getRows(constructorStandings, ['round', 'constructorId', 'position', 'points'])])
+    finally:
+        connection.close()
+
+def rescoreSeason(connection, season, qualiCompression=None, raceCompression=None):
+    # [(driverId, qualifying performance, race pace)] rounded like the build's, 0 for a driver without any results;
+    # the compressions default to the build's
+    params = {
+        'season': season,
+        'middle': EXPECTED_MIDDLE,
+        'qualiCompression': QUALI_COMPRESSION if qualiCompression is None else qualiCompression,
+        'raceCompression': RACE_COMPRESSION if raceCompression is None else raceCompression
+    }
+    return [(driverId, round(qualifying or 0, 2), round(race or 0, 2)) for driverId, qualifying, race in connection.execute(SCORE_QUERY, params)]
@@ -0,0 +1,103 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from . import fetch, sessions
+from .instrumentation import getSeasonReport, writeRunReport
+from .pipeline import buildSeasonOrError
+from .season import newSeasonState, loadSeasonState, saveSeasonState, getRaceStartTimes, getLatestRound, getProcessedRounds, updateSeasonState, dropRounds
+
+log = logging.getLogger(__name__)
+
+# results usually appear within a couple of hours of the start of a race, so from the start until
+# RESULTS_WINDOW later the latest race is polled every RACE_DAY_POLL_INTERVAL seconds; between
+# races it's polled when the next one starts, but never less often than IDLE_POLL_INTERVAL
+RACE_DAY_POLL_INTERVAL = 2 * 60
+IDLE_POLL_INTERVAL = 6 * 60 * 60
+RESULTS_WINDOW = timedelta(hours=24)
+# provisional results change with post-race penalties and disqualifications, so for RECHECK_WINDOW after
+# the start of a race its built results are fetched again every RECHECK_POLL_INTERVAL seconds
+RECHECK_POLL_INTERVAL = 30 * 60
+RECHECK_WINDOW = timedelta(hours=24)
+
+def getPollDelay(startTimes, processedRounds, now):
+    startedRounds = [roundNum for roundNum, startTime in startTimes.items() if startTime <= now]
+    if startedRounds:
+        latestStarted = max(startedRounds)
+        if latestStarted not in processedRounds and now < startTimes[latestStarted] + RESULTS_WINDOW:
+            return RACE_DAY_POLL_INTERVAL
+        if latestStarted in processedRounds and now < startTimes[latestStarted] + RECHECK_WINDOW:
+            return RECHECK_POLL_INTERVAL
+    
+    upcomingStarts = [startTime for startTime in startTimes.values() if startTime > now]
+    if not upcomingStarts:
+        return IDLE_POLL_INTERVAL
+    untilNextStart = (min(upcomingStarts) - now).total_seconds()
+    return min(max(untilNextStart, RACE_DAY_POLL_INTERVAL), IDLE_POLL_INTERVAL)
+
+def getRecheckRounds(startTimes, processedRounds, now):
+    return sorted(roundNum for roundNum in processedRounds if roundNum in startTimes and now < startTimes[roundNum] + RECHECK_WINDOW)
+
+def getRoundRows(seasonState, rounds):
+    resultRows = sorted((row for row in seasonState['resultsTable'] if row['round'] in rounds), key=lambda row: (row['round'], row['session'], row['driverId']))
+    qualifyingRows = sorted((row for row in seasonState['qualifyingTable'] if row['round'] in rounds), key=lambda row: (row['round'], row['driverId']))
+    return resultRows, qualifyingRows
+
+def getChangedRounds(seasonState, rounds):
+    # the rounds' results and qualifying fetched again past the cache, compared with the built ones
+    freshState = updateSeasonState(rounds, rounds, newSeasonState(seasonState['season']), maxAge=0)
+    return [roundNum for roundNum in rounds if getRoundRows(freshState, {roundNum}) != getRoundRows(seasonState, {roundNum})]
+
+def pollSeason(year, reportPath):
+    # 'last/races' is asked for on every poll, but a conditional request only returns a body when it changed
+    try:
+        latestRound = getLatestRound(year, maxAge=0)
+    except IndexError:
+        log.info(f"No {year} race has been run yet")
+        return
+    
+    seasonState = loadSeasonState(year)
+    processedRounds = getProcessedRounds(seasonState)
+    if latestRound not in processedRounds:
+        log.info(f"Round {latestRound} has been run, rebuilding")
+    else:
+        recheckRounds = getRecheckRounds(getRaceStartTimes(year), processedRounds, datetime.now(timezone.utc))
+        changedRounds = getChangedRounds(seasonState, recheckRounds) if recheckRounds else []
+        if not changedRounds:
+            log.debug(f"Round {latestRound} is already built")
+            return
+        
+        # the changed rounds are taken out of the state, so the refresh below fetches them again
+        log.info(f"Results of rounds {changedRounds} have changed since they were built, rebuilding")
+        saveSeasonState(dropRounds(seasonState, changedRounds))
+    
+    startedAt = datetime.now().isoformat(timespec='seconds')
+    start = time.perf_counter()
+    output, metrics = buildSeasonOrError(year, incremental=True)
+    
+    seasonReport = getSeasonReport(output, metrics)
+    writeRunReport(reportPath, startedAt, time.perf_counter() - start, {year: seasonReport})
+    if seasonReport['error']:
+        log.error(f"Rebuild for round {latestRound} failed: {seasonReport['error']}")
+    elif latestRound not in getProcessedRounds(loadSeasonState(year)):
+        log.info(f"Round {latestRound} results aren't published yet")
+    else:
+        log.info(f"{output} updated with round {latestRound}")
+
+def watchSeason(year, reportPath):
+    while True:
+        try:
+            pollSeason(year, reportPath)
+            delay = getPollDelay(getRaceStartTimes(year), getProcessedRounds(loadSeasonState(year)), datetime.now(timezone.utc))
+        except Exception as e:
+            # the watcher keeps going through network trouble, it just tries again soon
+            log.warning(f"Poll for {year} failed: {e}")
+            delay = RACE_DAY_POLL_INTERVAL
+        
+        # a build evicts the response cache when it runs from the command line, the watcher does it after
+        # every poll; loaded sessions are let go too, so the next poll loads them afresh
+        fetch.evictCache()
+        sessions.loadSessionResults.cache_clear()
+        
+        log.debug(f"Next poll in {delay:.0f}s")
+        time.sleep(delay)